@@ -0,0 +1,3 @@
+#! /bin/zsh
+
+python3 src/cli.py bench "$@"
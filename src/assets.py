@@ -0,0 +1,106 @@
+import os
+import shutil
+import hashlib
+import logging
+
+from output import read_state, write_state
+
+logger = logging.getLogger(__name__)
+
+
+def file_digest(path: str) -> str:
+  with open(path, "rb") as f:
+    return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def is_unchanged(src_path: str, dest_path: str, checksum: bool = False) -> bool:
+  try:
+    dest_stat = os.stat(dest_path)
+  except FileNotFoundError:
+    return False
+  src_stat = os.stat(src_path)
+  if (src_stat.st_dev, src_stat.st_ino) == (dest_stat.st_dev, dest_stat.st_ino):
+    return True
+  if src_stat.st_size != dest_stat.st_size:
+    return False
+  if checksum:
+    return file_digest(src_path) == file_digest(dest_path)
+  return src_stat.st_mtime_ns == dest_stat.st_mtime_ns
+
+
+def copy_file(src_path: str, dest_path: str, link: bool = False):
+  if os.path.lexists(dest_path):
+    os.remove(dest_path)
+
+  if link:
+    try:
+      os.link(src_path, dest_path)
+      return
+    except OSError:
+      pass
+
+  if hasattr(os, "copy_file_range"):
+    try:
+      with open(src_path, "rb") as src, open(dest_path, "wb") as dest:
+        while os.copy_file_range(src.fileno(), dest.fileno(), 1 << 30):
+          pass
+      shutil.copystat(src_path, dest_path)
+      return
+    except OSError:
+      pass
+
+  # shutil uses os.sendfile where the platform supports it
+  shutil.copy2(src_path, dest_path)
+
+
+def walk_files(root: str) -> list[str]:
+  files = []
+  for directory, _, file_names in os.walk(root):
+    for file_name in file_names:
+      files.append(os.path.relpath(os.path.join(directory, file_name), root))
+  return sorted(files)
+
+
+def remove_empty_parents(path: str, stop: str):
+  directory = os.path.dirname(path)
+  stop = os.path.abspath(stop)
+  while os.path.abspath(directory) != stop and directory:
+    try:
+      os.rmdir(directory)
+    except OSError:
+      return
+    directory = os.path.dirname(directory)
+
+
+def sync_directory(
+  src: str, dest: str, state_path: str, checksum: bool = False, link: bool = False
+) -> dict[str, int]:
+  # Only files this function synced before are candidates for removal, so generated
+  # pages living next to the assets in `dest` are left alone.
+  stats = {"copied": 0, "skipped": 0, "removed": 0}
+  if not os.path.exists(src):
+    logger.warning(f"Source directory '{src}' does not exist.")
+    return stats
+
+  previous = set(read_state(state_path, []))
+
+  current = walk_files(src)
+  for relative_path in current:
+    src_path = os.path.join(src, relative_path)
+    dest_path = os.path.join(dest, relative_path)
+    if is_unchanged(src_path, dest_path, checksum):
+      stats["skipped"] += 1
+      continue
+    os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+    copy_file(src_path, dest_path, link)
+    stats["copied"] += 1
+
+  for relative_path in sorted(previous.difference(current)):
+    dest_path = os.path.join(dest, relative_path)
+    if os.path.lexists(dest_path):
+      os.remove(dest_path)
+      remove_empty_parents(dest_path, dest)
+      stats["removed"] += 1
+
+  write_state(state_path, current, indent=1)
+  return stats
@@ -0,0 +1,309 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import subprocess
+import platform
+import tempfile
+import statistics
+import tracemalloc
+
+from functools import partial
+from process import (
+  block_to_block_type, markdown_to_blocks, markdown_to_html_node, text_to_textnodes
+)
+from template import Template
+from textnode import TextNode, TextType
+from htmlnode import HTMLNode, LeafNode, ParentNode
+
+# Wall time `cli.py --help` may add to a bare interpreter start, enforced by test_cli
+STARTUP_TARGET = 0.1
+# Modules a build only needs for some options; importing the CLI or main must not load them
+LAZY_MODULES = ("asyncio", "sqlite3", "concurrent.futures", "cProfile", "gzip", "cache")
+
+DEFAULT_BLOCK_MIX = {
+  "paragraph": 6,
+  "heading": 2,
+  "unordered_list": 1,
+  "ordered_list": 1,
+  "quote": 1,
+  "code": 1,
+}
+
+WORDS = (
+  "the of and to in is was for on that with as by at from his her elves ring shire "
+  "mordor gandalf frodo council mountain river forest tower king road journey"
+).split()
+
+INLINE_MARKUP = [
+  lambda w: f"**{w}**",
+  lambda w: f"*{w}*",
+  lambda w: f"`{w}`",
+  lambda w: f"[{w}](/{w})",
+  lambda w: f"![{w}](/images/{w}.png)",
+]
+
+BENCH_TEMPLATE = "<html><head><title> {{ Title }} </title></head><body>{{ Content }}</body></html>"
+
+
+def generate_text(rng: random.Random, words: int, inline_density: float) -> str:
+  out = []
+  for _ in range(words):
+    word = rng.choice(WORDS)
+    if rng.random() < inline_density:
+      word = rng.choice(INLINE_MARKUP)(word)
+    out.append(word)
+  return " ".join(out)
+
+
+def generate_block(rng: random.Random, block_type: str, inline_density: float) -> str:
+  match block_type:
+    case "heading":
+      return f"{'#' * rng.randint(2, 6)} {generate_text(rng, 6, inline_density)}"
+    case "paragraph":
+      lines = [generate_text(rng, 12, inline_density) for _ in range(rng.randint(1, 5))]
+      return "\n".join(lines)
+    case "unordered_list":
+      lines = [f"- {generate_text(rng, 8, inline_density)}" for _ in range(rng.randint(2, 6))]
+      return "\n".join(lines)
+    case "ordered_list":
+      count = rng.randint(2, 6)
+      lines = [f"{i}. {generate_text(rng, 8, inline_density)}" for i in range(1, count + 1)]
+      return "\n".join(lines)
+    case "quote":
+      lines = [f"> {generate_text(rng, 10, inline_density)}" for _ in range(rng.randint(1, 4))]
+      return "\n".join(lines)
+    case "code":
+      lines = [" ".join(rng.choice(WORDS) for _ in range(6)) for _ in range(rng.randint(2, 8))]
+      return "```\n" + "\n".join(lines) + "\n```"
+    case _:
+      raise ValueError(f"Invalid block type {block_type}")
+
+
+def generate_page(
+  rng: random.Random, blocks: int, block_mix: dict[str, float], inline_density: float
+) -> str:
+  types = list(block_mix)
+  weights = [block_mix[block_type] for block_type in types]
+  page = [f"# {generate_text(rng, 5, 0)}"]
+  for block_type in rng.choices(types, weights=weights, k=blocks):
+    page.append(generate_block(rng, block_type, inline_density))
+  return "\n\n".join(page) + "\n"
+
+
+def generate_corpus(
+  pages: int,
+  blocks: int = 40,
+  block_mix: dict[str, float] = DEFAULT_BLOCK_MIX,
+  inline_density: float = 0.1,
+  seed: int = 0
+) -> list[str]:
+  rng = random.Random(seed)
+  return [generate_page(rng, blocks, block_mix, inline_density) for _ in range(pages)]
+
+
+def write_corpus(corpus: list[str], content_dir_path: str):
+  for i, markdown in enumerate(corpus):
+    page_dir = os.path.join(content_dir_path, f"page{i}")
+    os.makedirs(page_dir, exist_ok=True)
+    with open(os.path.join(page_dir, "index.md"), "w") as f:
+      f.write(markdown)
+
+
+def time_stage(function, repeat: int) -> dict[str, float]:
+  timings = []
+  for _ in range(repeat):
+    start = time.perf_counter()
+    function()
+    timings.append(time.perf_counter() - start)
+  return {"best": min(timings), "median": statistics.median(timings)}
+
+
+def run_benchmarks(corpus: list[str], repeat: int = 5) -> dict[str, dict[str, float]]:
+  blocks = [block for markdown in corpus for block in markdown_to_blocks(markdown)]
+  texts = [" ".join(block.splitlines()) for block in blocks if not block.startswith("```")]
+  nodes = [markdown_to_html_node(markdown) for markdown in corpus]
+  htmls = [node.to_html() for node in nodes]
+  template = Template(BENCH_TEMPLATE)
+
+  def file_io():
+    with tempfile.TemporaryDirectory() as root:
+      for i, html in enumerate(htmls):
+        path = os.path.join(root, f"{i}.html")
+        with open(path, "w") as f:
+          f.write(html)
+        with open(path, "r") as f:
+          f.read()
+
+  stages = {
+    "markdown_to_blocks": lambda: [markdown_to_blocks(markdown) for markdown in corpus],
+    "block_to_block_type": lambda: [block_to_block_type(block) for block in blocks],
+    "text_to_textnodes": lambda: [text_to_textnodes(text) for text in texts],
+    "markdown_to_html_node": lambda: [markdown_to_html_node(markdown) for markdown in corpus],
+    "to_html": lambda: [node.to_html() for node in nodes],
+    "template": lambda: [template.render({"Title": "t", "Content": html}) for html in htmls],
+    "file_io": file_io,
+  }
+  return {name: time_stage(function, repeat) for name, function in stages.items()}
+
+
+class DictTextNode:
+  # Dict-backed copies of the node classes as they were before __slots__, kept as a baseline
+  def __init__(self, text, text_type, url=None) -> None:
+    self.text = text
+    self.text_type = text_type
+    self.url = url
+
+
+class DictHTMLNode:
+  def __init__(self, tag=None, value=None, children=None, props=None) -> None:
+    self.tag = tag
+    self.value = value
+    self.children = children
+    self.props = props
+
+
+class DictLeafNode(DictHTMLNode):
+  def __init__(self, value, tag=None, props=None) -> None:
+    super().__init__(tag, value, None, props)
+
+
+class DictParentNode(DictHTMLNode):
+  def __init__(self, tag, children, props=None) -> None:
+    super().__init__(tag, None, children, props)
+
+
+NODE_FACTORIES = {
+  "TextNode": {
+    "dict": lambda i: DictTextNode("text", TextType.NORMAL),
+    "slots": lambda i: TextNode("text", TextType.NORMAL),
+  },
+  "LeafNode": {
+    "dict": lambda i: DictLeafNode("text", "b"),
+    "slots": lambda i: LeafNode("text", "b"),
+  },
+  "ParentNode": {
+    "dict": lambda i: DictParentNode("p", ()),
+    "slots": lambda i: ParentNode("p", ()),
+  },
+}
+
+
+def measure_nodes(factory, count: int, repeat: int) -> dict[str, float]:
+  tracemalloc.start()
+  before = tracemalloc.get_traced_memory()[0]
+  nodes = [factory(i) for i in range(count)]
+  after = tracemalloc.get_traced_memory()[0]
+  tracemalloc.stop()
+  del nodes
+
+  timing = time_stage(lambda: [factory(i) for i in range(count)], repeat)
+  return {"bytes_per_node": (after - before) / count, "construct_best": timing["best"]}
+
+
+def run_node_benchmarks(count: int = 100000, repeat: int = 5) -> dict[str, dict]:
+  return {
+    name: {kind: measure_nodes(factory, count, repeat) for kind, factory in factories.items()}
+    for name, factories in NODE_FACTORIES.items()
+  }
+
+
+class UnescapedLeafNode(LeafNode):
+  # LeafNode as it rendered before escaping, kept as a baseline for the escaping overhead
+  __slots__ = ()
+
+  def to_html(self) -> str:
+    if self.tag is None:
+      return self.value
+    props = "".join([f' {key}="{value}"' for key, value in (self.props or {}).items()])
+    return f"<{self.tag}{props}>{self.value}</{self.tag}>"
+
+
+def unescaped_copy(node: HTMLNode) -> HTMLNode:
+  if isinstance(node, LeafNode):
+    return UnescapedLeafNode(node.value, node.tag, node.props)
+  return ParentNode(node.tag, [unescaped_copy(child) for child in node.children], node.props)
+
+
+def run_escape_benchmarks(corpus: list[str], repeat: int = 5) -> dict[str, dict[str, float]]:
+  nodes = [markdown_to_html_node(markdown) for markdown in corpus]
+  baseline = [unescaped_copy(node) for node in nodes]
+  results = {
+    "escaped": time_stage(lambda: [node.to_html() for node in nodes], repeat),
+    "unescaped": time_stage(lambda: [node.to_html() for node in baseline], repeat),
+  }
+  results["overhead"] = results["escaped"]["best"] / results["unescaped"]["best"] - 1
+  return results
+
+
+def run_startup_benchmarks(repeat: int = 5) -> dict[str, dict[str, float]]:
+  # Fresh interpreters: a bare start, the CLI's help, and the imports of a plain build
+  src_dir_path = os.path.dirname(os.path.abspath(__file__))
+  commands = {
+    "python": [sys.executable, "-c", "pass"],
+    "cli": [sys.executable, os.path.join(src_dir_path, "cli.py"), "--help"],
+    "build_imports": [sys.executable, "-c", "import main"],
+  }
+  env = dict(os.environ, PYTHONPATH=src_dir_path)
+  results = {}
+  for name, command in commands.items():
+    run = partial(subprocess.run, command, env=env, stdout=subprocess.DEVNULL, check=True)
+    results[name] = time_stage(run, repeat)
+  results["overhead"] = results["cli"]["best"] - results["python"]["best"]
+  return results
+
+
+def parse_block_mix(value: str) -> dict[str, float]:
+  mix = {}
+  for item in value.split(","):
+    block_type, weight = item.split("=")
+    mix[block_type.strip()] = float(weight)
+  return mix
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description="Benchmark the markdown pipeline stages")
+  parser.add_argument("--pages", type=int, default=200)
+  parser.add_argument("--blocks", type=int, default=40, help="blocks per page")
+  parser.add_argument("--inline-density", type=float, default=0.1)
+  parser.add_argument("--block-mix", type=parse_block_mix, default=DEFAULT_BLOCK_MIX,
+                      help="comma separated type=weight pairs, e.g. paragraph=6,code=1")
+  parser.add_argument("--repeat", type=int, default=5)
+  parser.add_argument("--seed", type=int, default=0)
+  parser.add_argument("--nodes", type=int, default=100000, help="nodes per node benchmark")
+  parser.add_argument("--output", help="write the JSON results here instead of stdout")
+  parser.add_argument("--write-corpus", metavar="DIR", help="also write the corpus to DIR")
+  args = parser.parse_args(argv)
+
+  corpus = generate_corpus(args.pages, args.blocks, args.block_mix, args.inline_density, args.seed)
+  if args.write_corpus:
+    write_corpus(corpus, args.write_corpus)
+  results = {
+    "config": {
+      "pages": args.pages,
+      "blocks": args.blocks,
+      "inline_density": args.inline_density,
+      "block_mix": args.block_mix,
+      "repeat": args.repeat,
+      "seed": args.seed,
+      "corpus_bytes": sum(len(markdown.encode("utf-8")) for markdown in corpus),
+    },
+    "python": platform.python_version(),
+    "stages": run_benchmarks(corpus, args.repeat),
+    "nodes": run_node_benchmarks(args.nodes, args.repeat),
+    "escape": run_escape_benchmarks(corpus, args.repeat),
+    "startup": run_startup_benchmarks(args.repeat),
+  }
+
+  if args.output:
+    with open(args.output, "w") as f:
+      json.dump(results, f, indent=2)
+  else:
+    json.dump(results, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,112 @@
+import os
+import time
+import sqlite3
+import hashlib
+
+from typing import Union
+
+import process
+import htmlnode
+import textnode
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def parser_version() -> str:
+  # Any edit to the parser or node modules changes the version and drops the cache
+  digest = hashlib.sha256()
+  for module in (process, htmlnode, textnode):
+    with open(module.__file__, "rb") as f:
+      digest.update(f.read())
+  return digest.hexdigest()
+
+
+def block_key(block: str) -> str:
+  return hashlib.blake2b(block.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class BlockCache:
+  def __init__(
+    self, path: str, max_bytes: int = DEFAULT_MAX_BYTES, version: Union[str, None] = None
+  ) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    self.path = path
+    self.max_bytes = max_bytes
+    self.version = version if version is not None else parser_version()
+    self.hits = 0
+    self.misses = 0
+    self.pending: dict[str, str] = {}
+    self.touched: set[str] = set()
+    self.connection = sqlite3.connect(path, timeout=60)
+    with self.connection:
+      self.connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+      self.connection.execute(
+        "CREATE TABLE IF NOT EXISTS blocks "
+        "(key TEXT PRIMARY KEY, html TEXT NOT NULL, size INTEGER NOT NULL, used INTEGER NOT NULL)"
+      )
+      row = self.connection.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+      if row is None or row[0] != self.version:
+        self.connection.execute("DELETE FROM blocks")
+        self.connection.execute(
+          "INSERT OR REPLACE INTO meta VALUES ('version', ?)", (self.version, )
+        )
+
+  def get(self, block: str) -> Union[str, None]:
+    key = block_key(block)
+    html = self.pending.get(key)
+    if html is None:
+      row = self.connection.execute("SELECT html FROM blocks WHERE key = ?", (key, )).fetchone()
+      html = row[0] if row is not None else None
+    if html is None:
+      self.misses += 1
+      return None
+    self.hits += 1
+    self.touched.add(key)
+    return html
+
+  def put(self, block: str, html: str):
+    self.pending[block_key(block)] = html
+
+  def flush(self):
+    now = time.time_ns()
+    with self.connection:
+      self.connection.executemany(
+        "INSERT OR REPLACE INTO blocks VALUES (?, ?, ?, ?)",
+        [(key, html, len(html), now) for key, html in self.pending.items()],
+      )
+      self.connection.executemany(
+        "UPDATE blocks SET used = ? WHERE key = ?", [(now, key) for key in self.touched]
+      )
+      self.evict()
+    self.pending.clear()
+    self.touched.clear()
+
+  def evict(self):
+    total = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM blocks").fetchone()[0]
+    if total <= self.max_bytes:
+      return
+    # Trim to 90% of the bound so eviction does not run on every flush
+    target = total - int(self.max_bytes * 0.9)
+    evicted = []
+    for key, size in self.connection.execute("SELECT key, size FROM blocks ORDER BY used"):
+      if target <= 0:
+        break
+      evicted.append((key, ))
+      target -= size
+    self.connection.executemany("DELETE FROM blocks WHERE key = ?", evicted)
+
+  def stats(self) -> dict[str, int]:
+    entries, size = self.connection.execute(
+      "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blocks"
+    ).fetchone()
+    return {"hits": self.hits, "misses": self.misses, "entries": entries, "bytes": size}
+
+  def close(self):
+    self.flush()
+    self.connection.close()
+
+  def __enter__(self) -> "BlockCache":
+    return self
+
+  def __exit__(self, *exc_info):
+    self.close()
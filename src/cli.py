@@ -0,0 +1,166 @@
+import os
+import sys
+import logging
+import argparse
+
+# Only argparse and logging are imported up front: every command imports the subsystems
+# it runs, so `--help`, `clean` and small per-directory builds start quickly
+
+logger = logging.getLogger(__name__)
+
+
+def add_path_arguments(parser: argparse.ArgumentParser):
+  parser.add_argument("--content", default="content", help="markdown sources")
+  parser.add_argument("--template", default="template.html")
+  parser.add_argument("--static", default="static", help="assets copied into the output")
+  parser.add_argument("--dest", default="public", help="output directory")
+  parser.add_argument("--cache-dir", default=".cache", help="incremental build state")
+
+
+def add_build_arguments(parser: argparse.ArgumentParser):
+  add_path_arguments(parser)
+  parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1)
+  parser.add_argument("--no-block-cache", action="store_true", help="disable the block cache")
+  parser.add_argument("--io-concurrency", type=int, default=0,
+                      help="build as an asyncio pipeline with this many reads/writes in flight")
+  parser.add_argument("--no-search-index", action="store_true",
+                      help="do not write search.idx")
+  parser.add_argument("--gzip", action="store_true",
+                      help="write precompressed .gz siblings of text files in the output")
+  parser.add_argument("--checksum", action="store_true",
+                      help="compare static assets by content rather than size and mtime")
+  parser.add_argument("--link", action="store_true",
+                      help="hard link static assets into the output instead of copying")
+
+
+def run_build(args: argparse.Namespace, profile) -> list[tuple[str, str]]:
+  from main import build_site
+
+  return build_site(
+    args.content,
+    args.template,
+    args.dest,
+    args.static,
+    args.cache_dir,
+    jobs=args.jobs,
+    profile=profile,
+    block_cache=not args.no_block_cache,
+    io_concurrency=args.io_concurrency,
+    search_index=not args.no_search_index,
+    gzip=args.gzip,
+    checksum=args.checksum,
+    link=args.link
+  )
+
+
+def build(args: argparse.Namespace):
+  from profiling import NULL_PROFILE, BuildProfile
+
+  profile = BuildProfile() if args.profile else NULL_PROFILE
+  profiler = None
+  if args.profile_dump:
+    import cProfile
+    profiler = cProfile.Profile()
+    profiler.enable()
+
+  errors = run_build(args, profile)
+
+  if profiler is not None:
+    profiler.disable()
+    profiler.dump_stats(args.profile_dump)
+  if profile.enabled:
+    print(profile.report(args.slowest))
+  if errors:
+    sys.exit(f"{len(errors)} page(s) failed to build")
+
+
+def serve(args: argparse.Namespace):
+  # Builds and serves in this interpreter, then rebuilds pages and assets as they change
+  from watch import SiteWatcher, serve as serve_directory
+  from profiling import NULL_PROFILE
+
+  if not args.no_build:
+    errors = run_build(args, NULL_PROFILE)
+    if errors:
+      logger.error(f"{len(errors)} page(s) failed to build")
+  cache = None
+  if not args.no_block_cache:
+    from cache import BlockCache
+    cache = BlockCache(os.path.join(args.cache_dir, "blocks.sqlite"))
+  watcher = SiteWatcher(
+    args.content, args.static, args.template, args.dest, args.cache_dir, cache=cache
+  )
+  server = serve_directory(args.dest, args.port)
+  try:
+    watcher.run()
+  except KeyboardInterrupt:
+    pass
+  finally:
+    server.shutdown()
+    if cache is not None:
+      cache.close()
+
+
+def clean(args: argparse.Namespace):
+  import shutil
+
+  paths = [args.dest] if args.keep_cache else [args.dest, args.cache_dir]
+  for path in paths:
+    if os.path.isdir(path):
+      shutil.rmtree(path)
+      logger.info(f"Removed {path}")
+
+
+def bench(args: argparse.Namespace):
+  from bench import main as bench_main
+
+  bench_main(args.bench_args)
+
+
+def make_parser() -> argparse.ArgumentParser:
+  parser = argparse.ArgumentParser(description="Build, serve and benchmark the static site")
+  parser.add_argument("--log-level", default="INFO")
+  commands = parser.add_subparsers(dest="command", required=True)
+
+  build_parser = commands.add_parser("build", help="build the site incrementally")
+  add_build_arguments(build_parser)
+  build_parser.add_argument("--profile", action="store_true",
+                            help="report per-stage build timings")
+  build_parser.add_argument("--slowest", type=int, default=10, help="slowest pages to report")
+  build_parser.add_argument("--profile-dump", metavar="PATH",
+                            help="write cProfile stats to PATH")
+  build_parser.set_defaults(handler=build)
+
+  serve_parser = commands.add_parser("serve", help="build, serve and rebuild on changes")
+  add_build_arguments(serve_parser)
+  serve_parser.add_argument("--port", type=int, default=8888)
+  serve_parser.add_argument("--no-build", action="store_true",
+                            help="serve the output as it is before watching")
+  serve_parser.set_defaults(handler=serve)
+
+  clean_parser = commands.add_parser("clean", help="remove the output and the build state")
+  add_path_arguments(clean_parser)
+  clean_parser.add_argument("--keep-cache", action="store_true",
+                            help="only remove the output directory")
+  clean_parser.set_defaults(handler=clean)
+
+  bench_parser = commands.add_parser(
+    "bench", help="run the pipeline benchmarks; other arguments are passed to bench.py"
+  )
+  bench_parser.set_defaults(handler=bench)
+  return parser
+
+
+def main(argv=None):
+  parser = make_parser()
+  args, extra = parser.parse_known_args(argv)
+  if args.command == "bench":
+    args.bench_args = extra
+  elif extra:
+    parser.error(f"unrecognized arguments: {' '.join(extra)}")
+  logging.basicConfig(level=args.log_level.upper(), format="%(message)s")
+  args.handler(args)
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,97 @@
+import os
+import gzip
+import hashlib
+import logging
+
+from typing import Union
+from concurrent.futures import ThreadPoolExecutor
+
+from assets import remove_empty_parents, walk_files
+from depgraph import stat_fingerprint
+from output import read_state, write_output, write_state
+
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE_EXTENSIONS = {
+  ".html", ".htm", ".css", ".js", ".mjs", ".json", ".svg", ".xml", ".txt", ".map", ".idx"
+}
+# Below this a .gz saves less than the extra round of content negotiation costs
+MIN_SIZE = 256
+STATE_VERSION = 1
+
+
+def compress_file(
+  src_path: str, previous_digest: Union[str, None], level: int = 9
+) -> tuple[str, bool, bool]:
+  # (digest, whether a .gz sibling should exist, whether it was written). The sibling is
+  # rewritten only when the source hash changed or the sibling went missing.
+  with open(src_path, "rb") as f:
+    data = f.read()
+  digest = hashlib.sha256(data).hexdigest()
+  gz_path = src_path + ".gz"
+  if digest == previous_digest and os.path.exists(gz_path):
+    return digest, True, False
+  # mtime=0 keeps the output byte-identical across builds of the same source
+  compressed = gzip.compress(data, compresslevel=level, mtime=0)
+  if len(compressed) >= len(data):
+    return digest, False, False
+  write_output(gz_path, compressed)
+  return digest, True, True
+
+
+def precompress(
+  dest_dir_path: str, state_path: str, jobs: int = 1, level: int = 9
+) -> dict[str, int]:
+  # Writes a .gz next to every compressible file in dest_dir_path for servers that send
+  # precompressed responses. Files whose stat fingerprint is unchanged since the last run
+  # are skipped outright; the others are hashed, and recompressed only if the hash moved.
+  state = read_state(state_path, {})
+  if state.get("version") != STATE_VERSION:
+    state = {"files": {}}
+
+  stats = {"compressed": 0, "skipped": 0, "removed": 0}
+  records = {}
+  pending = []
+  for relative_path in walk_files(dest_dir_path) if os.path.isdir(dest_dir_path) else []:
+    if os.path.splitext(relative_path)[1].lower() not in COMPRESSIBLE_EXTENSIONS:
+      continue
+    src_path = os.path.join(dest_dir_path, relative_path)
+    if os.path.getsize(src_path) < MIN_SIZE:
+      continue
+    record = state["files"].get(relative_path)
+    fingerprint = stat_fingerprint(src_path)
+    if (
+      record is not None and record["fingerprint"] == fingerprint and
+      os.path.exists(src_path + ".gz") == record["compressed"]
+    ):
+      records[relative_path] = record
+      stats["skipped"] += 1
+      continue
+    pending.append((relative_path, fingerprint, record["digest"] if record else None))
+
+  # zlib releases the GIL while deflating, so threads compress in parallel
+  with ThreadPoolExecutor(max_workers=max(jobs, 1)) as pool:
+    futures = [
+      pool.submit(compress_file, os.path.join(dest_dir_path, relative_path), digest, level)
+      for relative_path, _, digest in pending
+    ]
+    for (relative_path, fingerprint, _), future in zip(pending, futures):
+      digest, compressed, written = future.result()
+      records[relative_path] = {
+        "fingerprint": fingerprint, "digest": digest, "compressed": compressed
+      }
+      stats["compressed" if written else "skipped"] += 1
+
+  # Siblings of files that were deleted or stopped compressing well
+  for relative_path, record in state["files"].items():
+    current = records.get(relative_path)
+    if not record["compressed"] or (current is not None and current["compressed"]):
+      continue
+    gz_path = os.path.join(dest_dir_path, relative_path + ".gz")
+    if os.path.exists(gz_path):
+      os.remove(gz_path)
+      remove_empty_parents(gz_path, dest_dir_path)
+      stats["removed"] += 1
+
+  write_state(state_path, {"version": STATE_VERSION, "files": records}, indent=1)
+  return stats
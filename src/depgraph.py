@@ -0,0 +1,111 @@
+import os
+import sys
+import argparse
+
+from typing import Iterable, Union
+
+from output import read_state, write_state
+
+GRAPH_VERSION = 2
+
+
+class DependencyGraph:
+  def __init__(self) -> None:
+    # source -> {"output": path, "inputs": [paths read to build it]}
+    self.pages: dict[str, dict] = {}
+    # input path -> fingerprint recorded when its dependents were last built
+    self.inputs: dict[str, Union[str, None]] = {}
+    # Version of the generator that built the pages; see main.generator_version
+    self.generator: Union[str, None] = None
+    self._reverse: Union[dict[str, set[str]], None] = None
+
+  # Paths are stored normalized so "./static/a.png" and "static/a.png" are the same input,
+  # and "./public/index.html" and "public/index.html" the same output
+  def set_page(self, source: str, output: str, inputs: Iterable[str]):
+    inputs = {os.path.normpath(input_path) for input_path in inputs}
+    self.pages[os.path.normpath(source)] = {
+      "output": os.path.normpath(output), "inputs": sorted(inputs)
+    }
+    self._reverse = None
+
+  def get_page(self, source: str) -> Union[dict, None]:
+    page = self.pages.get(os.path.normpath(source))
+    if page is not None:
+      # Manifests written before outputs were normalized
+      page["output"] = os.path.normpath(page["output"])
+    return page
+
+  def remove_page(self, source: str) -> Union[dict, None]:
+    self._reverse = None
+    return self.pages.pop(os.path.normpath(source), None)
+
+  def dependencies(self, source: str) -> list[str]:
+    page = self.get_page(source)
+    return page["inputs"] if page is not None else []
+
+  def dependents(self, path: str) -> list[str]:
+    path = os.path.normpath(path)
+    if self._reverse is None:
+      self._reverse = {}
+      for source, page in self.pages.items():
+        for input_path in page["inputs"]:
+          self._reverse.setdefault(input_path, set()).add(source)
+    return sorted(self._reverse.get(path, ()))
+
+  def prune_inputs(self):
+    used = {input_path for page in self.pages.values() for input_path in page["inputs"]}
+    self.inputs = {path: key for path, key in self.inputs.items() if path in used}
+
+  @classmethod
+  def load(cls, path: str) -> "DependencyGraph":
+    graph = cls()
+    data = read_state(path, {})
+    if data.get("version") == GRAPH_VERSION:
+      graph.pages = data["pages"]
+      graph.inputs = data["inputs"]
+      graph.generator = data.get("generator")
+    return graph
+
+  def save(self, path: str):
+    write_state(
+      path,
+      {
+        "version": GRAPH_VERSION,
+        "generator": self.generator,
+        "pages": self.pages,
+        "inputs": self.inputs
+      },
+      indent=1,
+      sort_keys=True
+    )
+
+
+def stat_fingerprint(path: str) -> Union[str, None]:
+  # Assets are fingerprinted by size and mtime; None records that the file was missing
+  try:
+    stat = os.stat(path)
+  except OSError:
+    return None
+  return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description="Query the build dependency graph")
+  parser.add_argument("paths", nargs="+", help="inputs to list dependent pages for")
+  parser.add_argument("--manifest", default=os.path.join(".cache", "manifest.json"))
+  parser.add_argument("--inputs", action="store_true", help="list a page's inputs instead")
+  args = parser.parse_args(argv)
+
+  graph = DependencyGraph.load(args.manifest)
+  for path in args.paths:
+    sys.stdout.write(f"{path}:\n")
+    if args.inputs:
+      for input_path in graph.dependencies(path):
+        sys.stdout.write(f"  {input_path}\n")
+      continue
+    for source in graph.dependents(path):
+      sys.stdout.write(f"  {source} -> {graph.pages[source]['output']}\n")
+
+
+if __name__ == "__main__":
+  main()
@@ -1,7 +1,33 @@
-from typing import Union, Sequence
+from io import StringIO
+from typing import Union, Sequence, TextIO
+
+# Text content only needs &, < and > escaped; attribute values are quoted, so quotes too
+TEXT_ESCAPES = str.maketrans({"&": "&amp;", "<": "&lt;", ">": "&gt;"})
+ATTRIBUTE_ESCAPES = str.maketrans({
+  "&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;", "'": "&#x27;"
+})
+
+
+def escape_text(text: str) -> str:
+  # Most spans contain none of the special characters; a few substring checks are far
+  # cheaper than translate, so clean strings are returned as they are
+  if "&" not in text and "<" not in text and ">" not in text:
+    return text
+  return text.translate(TEXT_ESCAPES)
+
+
+def escape_attribute(value: str) -> str:
+  if (
+    "&" not in value and "<" not in value and ">" not in value and '"' not in value and
+    "'" not in value
+  ):
+    return value
+  return value.translate(ATTRIBUTE_ESCAPES)
 
 
 class HTMLNode:
+  __slots__ = ("tag", "value", "children", "props")
+
   def __init__(
     self,
     tag: Union[str, None] = None,
@@ -23,9 +49,12 @@ class HTMLNode:
   def to_html(self):
     raise NotImplementedError("to_html method not implemented")
 
+  def write_html(self, out: TextIO):
+    raise NotImplementedError("write_html method not implemented")
+
   def props_to_html(self) -> str:
     if self.props is not None:
-      return "".join([f' {key}="{value}"' for key, value in self.props.items()])
+      return "".join([f' {key}="{escape_attribute(value)}"' for key, value in self.props.items()])
     return ""
 
   def __repr__(self) -> str:
@@ -33,33 +62,75 @@ class HTMLNode:
 
 
 class LeafNode(HTMLNode):
+  __slots__ = ()
+
   def __init__(
     self, value: str, tag: Union[str, None] = None, props: Union[dict, None] = None
   ) -> None:
-    super().__init__(tag, value, None, props)
+    # Assigned directly rather than through super().__init__; leaves are built per inline span
+    self.tag = tag
+    self.value = value
+    self.children = None
+    self.props = props
 
   def to_html(self) -> str:
     if self.value is None:
       raise ValueError("All leaf nodes must have a value.")
 
     if self.tag is None:
-      return self.value
+      return escape_text(self.value)
 
-    return f"<{self.tag}{self.props_to_html()}>{self.value}</{self.tag}>"
+    return f"<{self.tag}{self.props_to_html()}>{escape_text(self.value)}</{self.tag}>"
+
+  def write_html(self, out: TextIO):
+    out.write(self.to_html())
 
   def __repr__(self) -> str:
     return f"LeafNode({self.tag}, {self.value}, {self.props})"
 
 
+class RawNode(HTMLNode):
+  # Already rendered HTML, e.g. a block fragment served from the block cache
+  __slots__ = ()
+
+  def __init__(self, value: str) -> None:
+    self.tag = None
+    self.value = value
+    self.children = None
+    self.props = None
+
+  def to_html(self) -> str:
+    return self.value
+
+  def write_html(self, out: TextIO):
+    out.write(self.value)
+
+  def __repr__(self) -> str:
+    return f"RawNode({self.value})"
+
+
 class ParentNode(HTMLNode):
+  __slots__ = ()
+
   def __init__(self, tag: str, children: Sequence[HTMLNode], props: Union[dict, None] = None) -> None:
-    super().__init__(tag, None, children, props)
+    self.tag = tag
+    self.value = None
+    self.children = children
+    self.props = props
 
-  def to_html(self):
+  def to_html(self) -> str:
+    out = StringIO()
+    self.write_html(out)
+    return out.getvalue()
+
+  def write_html(self, out: TextIO):
     if self.tag is None:
       raise ValueError("All parent nodes must have a tag")
 
     if not self.children:
       raise ValueError("Parent nodes must have at least one child")
 
-    return f"<{self.tag}{self.props_to_html()}>{''.join([child.to_html() for child in self.children])}</{self.tag}>"
+    out.write(f"<{self.tag}{self.props_to_html()}>")
+    for child in self.children:
+      child.write_html(out)
+    out.write(f"</{self.tag}>")
@@ -0,0 +1,163 @@
+import os
+import struct
+import logging
+
+from typing import BinaryIO, Callable, Union
+
+from assets import copy_file, file_digest, is_unchanged, remove_empty_parents, walk_files
+from depgraph import stat_fingerprint
+from output import read_state, write_state
+
+try:
+  from PIL import Image
+except ImportError:  # Sizes are read from the file headers; only derivatives need Pillow
+  Image = None
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".gif", ".webp"}
+DERIVATIVE_WIDTHS = (480, 960, 1600)
+STATE_VERSION = 1
+# Start-of-frame markers carry the size of a JPEG; C4, C8 and CC are other segments
+JPEG_SOF_MARKERS = {0xc0, 0xc1, 0xc2, 0xc3, 0xc5, 0xc6, 0xc7, 0xc9, 0xca, 0xcb, 0xcd, 0xce, 0xcf}
+
+
+def jpeg_size(f: BinaryIO) -> Union[tuple[int, int], None]:
+  # Walk the segment headers after SOI, seeking over every payload until a frame header
+  f.seek(2)
+  while True:
+    marker = f.read(2)
+    if len(marker) < 2 or marker[0] != 0xff:
+      return None
+    if marker[1] in (0xd8, 0x01) or 0xd0 <= marker[1] <= 0xd7:
+      continue
+    length = f.read(2)
+    if len(length) < 2:
+      return None
+    if marker[1] in JPEG_SOF_MARKERS:
+      header = f.read(5)
+      if len(header) < 5:
+        return None
+      height, width = struct.unpack(">HH", header[1:5])
+      return width, height
+    f.seek(struct.unpack(">H", length)[0] - 2, os.SEEK_CUR)
+
+
+def image_size(path: str) -> Union[tuple[int, int], None]:
+  # (width, height) from the file header, or None for unknown or truncated files
+  with open(path, "rb") as f:
+    header = f.read(30)
+    if header.startswith(b"\x89PNG\r\n\x1a\n") and header[12:16] == b"IHDR":
+      return struct.unpack(">II", header[16:24])
+    if header[:6] in (b"GIF87a", b"GIF89a"):
+      return struct.unpack("<HH", header[6:10])
+    if header.startswith(b"\xff\xd8"):
+      return jpeg_size(f)
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+      chunk = header[12:16]
+      if chunk == b"VP8 " and len(header) >= 30:
+        width, height = struct.unpack("<HH", header[26:30])
+        return width & 0x3fff, height & 0x3fff
+      if chunk == b"VP8L" and len(header) >= 25:
+        bits = int.from_bytes(header[21:25], "little")
+        return (bits & 0x3fff) + 1, (bits >> 14 & 0x3fff) + 1
+      if chunk == b"VP8X" and len(header) >= 30:
+        width = int.from_bytes(header[24:27], "little") + 1
+        return width, int.from_bytes(header[27:30], "little") + 1
+  return None
+
+
+def make_derivative(src_path: str, dest_path: str, width: int):
+  with Image.open(src_path) as image:
+    height = max(1, round(image.height * width / image.width))
+    resized = image.resize((width, height), Image.LANCZOS)
+    if dest_path.lower().endswith((".jpg", ".jpeg")):
+      resized.save(dest_path, quality=82, optimize=True, progressive=True)
+    else:
+      resized.save(dest_path, optimize=True)
+
+
+def derivative_path(relative_path: str, width: int) -> str:
+  root, extension = os.path.splitext(relative_path)
+  return f"{root}-{width}w{extension}"
+
+
+def process_images(
+  static_dir_path: str,
+  dest_dir_path: str,
+  state_path: str,
+  cache_dir_path: str,
+  widths: tuple[int, ...] = DERIVATIVE_WIDTHS,
+  resize: Union[Callable[[str, str, int], None], None] = None
+) -> dict[str, dict]:
+  # Returns site URL -> {"width", "height", "derivatives": [(url, width)]} for every image
+  # in the static directory. Derivatives are rendered once per content hash and width into
+  # cache_dir_path and copied next to the original in dest_dir_path. Without Pillow (and no
+  # `resize`) only the sizes are recorded.
+  if resize is None and Image is not None:
+    resize = make_derivative
+  state = read_state(state_path, {})
+  if state.get("version") != STATE_VERSION:
+    state = {"images": {}, "outputs": []}
+
+  images = {}
+  records = {}
+  outputs = []
+  stats = {"images": 0, "rendered": 0, "copied": 0, "removed": 0}
+  for relative_path in walk_files(static_dir_path) if os.path.isdir(static_dir_path) else []:
+    extension = os.path.splitext(relative_path)[1].lower()
+    if extension not in IMAGE_EXTENSIONS:
+      continue
+    src_path = os.path.join(static_dir_path, relative_path)
+    record = state["images"].get(relative_path)
+    fingerprint = stat_fingerprint(src_path)
+    if record is None or record["fingerprint"] != fingerprint:
+      size = image_size(src_path)
+      if size is None:
+        logger.warning(f"{src_path}: unrecognised image header")
+        continue
+      record = {
+        "fingerprint": fingerprint, "digest": file_digest(src_path), "width": size[0],
+        "height": size[1]
+      }
+    records[relative_path] = record
+    stats["images"] += 1
+
+    derivatives = []
+    for width in sorted(widths):
+      if width >= record["width"]:
+        break
+      cached_path = os.path.join(cache_dir_path, f"{record['digest']}-{width}{extension}")
+      if not os.path.exists(cached_path):
+        if resize is None:
+          break
+        os.makedirs(cache_dir_path, exist_ok=True)
+        resize(src_path, cached_path + ".tmp", width)
+        os.replace(cached_path + ".tmp", cached_path)
+        stats["rendered"] += 1
+      output = derivative_path(relative_path, width)
+      dest_path = os.path.join(dest_dir_path, output)
+      if not is_unchanged(cached_path, dest_path):
+        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+        copy_file(cached_path, dest_path)
+        stats["copied"] += 1
+      outputs.append(output)
+      derivatives.append(("/" + output.replace(os.sep, "/"), width))
+
+    url = "/" + relative_path.replace(os.sep, "/")
+    images[url] = {
+      "width": record["width"], "height": record["height"], "derivatives": derivatives
+    }
+
+  for output in sorted(set(state["outputs"]).difference(outputs)):
+    dest_path = os.path.join(dest_dir_path, output)
+    if os.path.lexists(dest_path):
+      os.remove(dest_path)
+      remove_empty_parents(dest_path, dest_dir_path)
+      stats["removed"] += 1
+
+  write_state(
+    state_path, {"version": STATE_VERSION, "images": records, "outputs": outputs}, indent=1
+  )
+  logger.info(f"Processed images: {stats}")
+  return images
@@ -0,0 +1,126 @@
+import os
+import json
+import posixpath
+
+from typing import Callable, Iterable, Union
+from urllib.parse import urlsplit
+
+from output import read_state, write_output, write_state
+
+STATE_VERSION = 1
+
+
+def resolve_link(page_url: str, target: str) -> Union[tuple[str, str], None]:
+  # (path, fragment) of a link within the site, or None for external and non-page links
+  parts = urlsplit(target)
+  if parts.scheme or parts.netloc:
+    return None
+  if not parts.path:
+    return page_url, parts.fragment
+  if parts.path.startswith("/"):
+    path = parts.path
+  else:
+    base = page_url if page_url.endswith("/") else posixpath.dirname(page_url) + "/"
+    path = posixpath.join(base, parts.path)
+  normalized = posixpath.normpath(path)
+  if path.endswith("/") and normalized != "/":
+    normalized += "/"
+  return normalized, parts.fragment
+
+
+class LinkGraph:
+  def __init__(self) -> None:
+    # source -> {"url", "title", "links": [targets as written], "anchors": [heading ids]}
+    self.pages: dict[str, dict] = {}
+    # Like SearchIndex.changed: an unchanged graph is not checked, written or saved again
+    self.changed = False
+
+  def set_page(
+    self, source: str, url: str, title: str, links: Iterable[str], anchors: Iterable[str]
+  ):
+    page = {"url": url, "title": title, "links": list(links), "anchors": list(anchors)}
+    source = os.path.normpath(source)
+    if self.pages.get(source) != page:
+      self.pages[source] = page
+      self.changed = True
+
+  def remove_page(self, source: str) -> Union[dict, None]:
+    page = self.pages.pop(os.path.normpath(source), None)
+    if page is not None:
+      self.changed = True
+    return page
+
+  def __contains__(self, source: str) -> bool:
+    return os.path.normpath(source) in self.pages
+
+  def page_urls(self) -> dict[str, dict]:
+    # "/post/" is also reachable as "/post" and "/post/index.html"
+    urls = {}
+    for page in self.pages.values():
+      url = page["url"]
+      urls[url] = page
+      if url.endswith("/"):
+        urls[url + "index.html"] = page
+        if url != "/":
+          urls[url[:-1]] = page
+    return urls
+
+  def edges(self) -> dict[str, list[str]]:
+    # Page URL -> URLs of the site pages it links to, in order and without repeats
+    urls = self.page_urls()
+    graph = {}
+    for page in sorted(self.pages.values(), key=lambda page: page["url"]):
+      targets = graph.setdefault(page["url"], [])
+      for link in page["links"]:
+        resolved = resolve_link(page["url"], link)
+        if resolved is None or resolved[0] not in urls:
+          continue
+        target_url = urls[resolved[0]]["url"]
+        if target_url not in targets:
+          targets.append(target_url)
+    return graph
+
+  def broken_links(
+    self, asset_exists: Callable[[str], bool] = lambda path: False
+  ) -> list[tuple[str, str]]:
+    # (source, target) for internal links to a missing page, asset or heading anchor
+    urls = self.page_urls()
+    broken = []
+    for source, page in sorted(self.pages.items()):
+      for link in page["links"]:
+        resolved = resolve_link(page["url"], link)
+        if resolved is None:
+          continue
+        path, fragment = resolved
+        target = urls.get(path)
+        if target is None:
+          if not asset_exists(path):
+            broken.append((source, link))
+        elif fragment and fragment not in target["anchors"]:
+          broken.append((source, link))
+    return broken
+
+  def write(self, path: str):
+    # Sitewide link graph for navigation: every page with its outgoing and incoming links
+    edges = self.edges()
+    backlinks = {url: [] for url in edges}
+    for url, targets in edges.items():
+      for target in targets:
+        backlinks[target].append(url)
+    titles = {page["url"]: page["title"] for page in self.pages.values()}
+    graph = {
+      url: {"title": titles[url], "links": targets, "backlinks": backlinks[url]}
+      for url, targets in edges.items()
+    }
+    write_output(path, json.dumps(graph, indent=1))
+
+  @classmethod
+  def load(cls, path: str) -> "LinkGraph":
+    graph = cls()
+    data = read_state(path, {})
+    if data.get("version") == STATE_VERSION:
+      graph.pages = data["pages"]
+    return graph
+
+  def save(self, path: str):
+    write_state(path, {"version": STATE_VERSION, "pages": self.pages}, separators=(",", ":"))
@@ -1,74 +1,689 @@
 import os
-import shutil
+import sys
+import hashlib
+import logging
 
-from process import extract_title, markdown_to_blocks, markdown_to_html_node
+from io import StringIO
+from typing import TYPE_CHECKING, Callable, Iterable, Iterator, TextIO, Union
+from functools import partial
+from itertools import chain, islice
 
+from assets import file_digest, sync_directory
+from depgraph import DependencyGraph, stat_fingerprint
+from output import merge_stats, open_output, output_stats, stats_since, write_output
+from htmlnode import HTMLNode, escape_text
+from template import Template, load_template
+from process import (
+  Document, extract_markdown_images, parse_document, scan_document, toc_node,
+  write_markdown_html
+)
+from search import SearchIndex, page_postings, page_url
+from links import LinkGraph
+from profiling import NULL_PROFILE, BuildProfile
 
-def copy_directory(src, dest):
-  if not os.path.exists(src):
-    print(f"Source directory '{src}' does not exist.")
-    return
+# The block cache (sqlite3), the process pool, the asyncio pipeline and the image and
+# compression stages are imported where they are used, so builds that skip them and
+# short CLI commands do not pay for the imports at startup
+if TYPE_CHECKING:
+  from cache import BlockCache
 
-  if os.path.exists(dest):
-    shutil.rmtree(dest)
-  os.makedirs(dest)
+logger = logging.getLogger(__name__)
 
-  for item in os.listdir(src):
-    src_path = os.path.join(src, item)
-    dest_path = os.path.join(dest, item)
+CACHE_DIR = ".cache"
+# Sources larger than this are never loaded whole; they are streamed block by block
+STREAM_THRESHOLD = 32 * 1024 * 1024
+# Markdown per process pool task; batches are filled as pages are planned
+BATCH_BYTES = 256 * 1024
+GENERATOR_MODULES = ("main.py", "process.py", "htmlnode.py", "textnode.py", "template.py")
 
-    if os.path.isdir(src_path):
-      copy_directory(src_path, dest_path)
-    else:
-      shutil.copy(src_path, dest_path)
+# (source path, destination path, markdown or None when the source is streamed)
+PageJob = tuple[str, str, Union[str, None]]
+
+
+def hash_bytes(data: bytes) -> str:
+  return hashlib.sha256(data).hexdigest()
+
+
+def generator_version() -> str:
+  # Digest of the modules that turn markdown into pages. Pages recorded in a manifest by
+  # another version are all rebuilt, so parser and rendering changes reach unchanged
+  # sources too.
+  src_dir_path = os.path.dirname(os.path.abspath(__file__))
+  digest = hashlib.sha256()
+  for name in GENERATOR_MODULES:
+    with open(os.path.join(src_dir_path, name), "rb") as f:
+      digest.update(f.read())
+  return digest.hexdigest()
+
+
+def decode_text(data: bytes) -> str:
+  # Same newline handling as opening the file in text mode
+  return data.decode("utf-8").replace("\r\n", "\n").replace("\r", "\n")
+
+
+def write_page(
+  out: TextIO,
+  content: Union[HTMLNode, Callable[[TextIO], None]],
+  title: str,
+  template: Template,
+  toc: Union[HTMLNode, None] = None
+):
+  template.write(out, {
+    "Title": escape_text(title), "Content": content, "TOC": toc if toc is not None else ""
+  })
+
+
+def render_page(document: Document, template: Template) -> str:
+  out = StringIO()
+  write_page(out, document.node, document.require_title(), template, toc_node(document.headings))
+  return out.getvalue()
+
+
+def page_dest_path(content_dir_path: str, dest_dir_path: str, content_file_path: str) -> str:
+  relative_dir, file_name = os.path.split(os.path.relpath(content_file_path, content_dir_path))
+  return os.path.join(dest_dir_path, relative_dir, file_name.replace(".md", ".html"))
+
+
+def walk_pages(content_dir_path: str, dest_dir_path: str):
+  for root, _, files in os.walk(content_dir_path):
+    for file_name in files:
+      # Like SiteWatcher.is_source: .DS_Store, swap files and the like are not pages
+      if not file_name.endswith(".md"):
+        continue
+      content_file_path = os.path.join(root, file_name)
+      yield content_file_path, page_dest_path(content_dir_path, dest_dir_path, content_file_path)
+
+
+def build_page_streaming(
+  content_file_path: str,
+  dest_file_path: str,
+  template: Template,
+  cache=None,
+  images: Union[dict, None] = None
+) -> Document:
+  # The returned document has no tree: only the title, headings and links are kept
+  with open(content_file_path, "r", encoding="utf-8") as src:
+    # Same title and TOC as a parsed page, from a pre-pass over the blocks
+    document = scan_document(src)
+    title = document.require_title()
+    src.seek(0)
+    content = partial(
+      write_markdown_html, src, cache=cache, images=images, links=document.links
+    )
+    with open_output(dest_file_path) as f:
+      write_page(f, content, title, template, toc_node(document.headings))
+  return document
+
+
+def build_page(
+  content_file_path: str,
+  dest_file_path: str,
+  markdown: Union[str, None],
+  template: Template,
+  profile: BuildProfile = NULL_PROFILE,
+  cache: Union["BlockCache", None] = None,
+  images: Union[dict, None] = None
+) -> Document:
+  if markdown is None:
+    # Oversized sources are converted block by block straight from disk
+    with profile.stage("stream"):
+      return build_page_streaming(content_file_path, dest_file_path, template, cache, images)
+
+  document = parse_document(markdown, profile, cache, images)
+  node, title = document.node, document.require_title()
+  toc = toc_node(document.headings)
+
+  if not profile.enabled:
+    # Rendered in memory so unchanged pages can be detected and left untouched
+    out = StringIO()
+    write_page(out, node, title, template, toc)
+    write_output(dest_file_path, out.getvalue())
+    return document
+
+  # Profiled builds render to strings first so each stage can be timed on its own
+  with profile.stage("serialize"):
+    html = node.to_html()
+  with profile.stage("template"):
+    processed_content = template.render({
+      "Title": escape_text(title), "Content": html, "TOC": toc.to_html() if toc is not None else ""
+    })
+  with profile.stage("write"):
+    write_output(dest_file_path, processed_content)
+  return document
+
+
+def page_summary(document: Document, terms: bool = True) -> dict:
+  # What the parent process keeps of a built page for the search index and link graph.
+  # Pages are only tokenized for a search index (`terms`); streamed pages have no tree to
+  # tokenize (terms None) and are only in the link graph.
+  return {
+    "title": document.require_title(),
+    "terms": page_postings(document.node) if terms and document.node is not None else None,
+    "links": document.links,
+    "anchors": [anchor for _, _, anchor in document.headings],
+  }
+
+
+def build_batch(
+  batch: Iterable[PageJob],
+  template: Template,
+  profile: BuildProfile = NULL_PROFILE,
+  cache: Union["BlockCache", None] = None,
+  summaries: Union[dict[str, dict], None] = None,
+  images: Union[dict, None] = None,
+  terms: bool = True
+) -> list[tuple[str, str]]:
+  # Summaries of the built pages are added to `summaries` if given; see page_summary
+  errors = []
+  for content_file_path, dest_file_path, markdown in batch:
+    logger.debug(f"Generating {content_file_path} to {dest_file_path}")
+    try:
+      with profile.page(content_file_path):
+        document = build_page(
+          content_file_path, dest_file_path, markdown, template, profile, cache, images
+        )
+      if summaries is not None:
+        summaries[content_file_path] = page_summary(document, terms)
+    except Exception as e:
+      errors.append((content_file_path, f"{type(e).__name__}: {e}"))
+  if cache is not None:
+    cache.flush()
+  return errors
+
+
+_worker_template = None
+_worker_profiling = False
+_worker_cache = None
+_worker_summaries = False
+_worker_images = None
+_worker_terms = True
+
+
+def _init_worker(
+  template: Template,
+  profiling: bool,
+  cache_path: Union[str, None],
+  summaries: bool = False,
+  images: Union[dict, None] = None,
+  terms: bool = True
+):
+  # The template and image table are shipped once per worker process rather than per batch
+  global _worker_template, _worker_profiling, _worker_cache, _worker_summaries, _worker_images
+  global _worker_terms
+  _worker_template = template
+  _worker_profiling = profiling
+  _worker_cache = None
+  if cache_path is not None:
+    from cache import BlockCache
+    _worker_cache = BlockCache(cache_path)
+  _worker_summaries = summaries
+  _worker_images = images
+  _worker_terms = terms
+
+
+def _build_batch_in_worker(batch: list[PageJob]) -> dict:
+  profile = BuildProfile() if _worker_profiling else NULL_PROFILE
+  hits, misses = (_worker_cache.hits, _worker_cache.misses) if _worker_cache else (0, 0)
+  before = output_stats()
+  summaries = {} if _worker_summaries else None
+  errors = build_batch(
+    batch, _worker_template, profile, _worker_cache, summaries, _worker_images, _worker_terms
+  )
+  return {
+    "errors": errors,
+    "summaries": summaries,
+    "profile": profile if profile.enabled else None,
+    "cache_hits": _worker_cache.hits - hits if _worker_cache else 0,
+    "cache_misses": _worker_cache.misses - misses if _worker_cache else 0,
+    "output": stats_since(before),
+  }
+
+
+def build_batches_parallel(
+  batches: Iterable[list[PageJob]],
+  template: Template,
+  jobs: int,
+  profile: BuildProfile = NULL_PROFILE,
+  cache: Union["BlockCache", None] = None,
+  summaries: Union[dict[str, dict], None] = None,
+  images: Union[dict, None] = None,
+  terms: bool = True
+) -> list[tuple[str, str]]:
+  # Batches are taken lazily with at most two per worker queued, so only the sources of
+  # those batches are held in memory at once. A build that fits in one batch is done in
+  # this process: starting the workers would cost more than the pool saves.
+  batches = iter(batches)
+  first = list(islice(batches, 2))
+  if len(first) < 2:
+    return build_batch(
+      first[0] if first else [], template, profile, cache, summaries, images, terms
+    )
+  from collections import deque
+  from concurrent.futures import ProcessPoolExecutor
+
+  errors = []
+
+  def merge(result: dict):
+    errors.extend(result["errors"])
+    if summaries is not None:
+      summaries.update(result["summaries"])
+    if result["profile"] is not None:
+      profile.merge(result["profile"])
+    if cache is not None:
+      cache.hits += result["cache_hits"]
+      cache.misses += result["cache_misses"]
+    merge_stats(result["output"])
+
+  cache_path = cache.path if cache is not None else None
+  initargs = (template, profile.enabled, cache_path, summaries is not None, images, terms)
+  with ProcessPoolExecutor(
+    max_workers=jobs, initializer=_init_worker, initargs=initargs
+  ) as executor:
+    queued = deque()
+    for batch in chain(first, batches):
+      if len(queued) == 2 * jobs:
+        merge(queued.popleft().result())
+      queued.append(executor.submit(_build_batch_in_worker, batch))
+    while queued:
+      merge(queued.popleft().result())
+  return errors
+
+
+def iter_batches(page_jobs: Iterable[PageJob], batch_bytes: int) -> Iterator[list[PageJob]]:
+  # Groups jobs into batches of about batch_bytes of markdown; a streamed page (no
+  # markdown read) counts as a full batch, so it closes the batch it joins
+  batch = []
+  size = 0
+  for job in page_jobs:
+    batch.append(job)
+    size += len(job[2]) if job[2] is not None else batch_bytes
+    if size >= batch_bytes:
+      yield batch
+      batch = []
+      size = 0
+  if batch:
+    yield batch
 
 
 def generate_page(from_path: str, template_path: str, dest_path: str):
-  print(f"Generating from {from_path} to {dest_path} using {template_path}...")
+  logger.info(f"Generating from {from_path} to {dest_path} using {template_path}...")
 
   with open(from_path, "r") as f:
     markdown = f.read()
 
-  with open(template_path, "r") as f:
-    template = f.read()
+  template = load_template(template_path)
 
-  html = markdown_to_html_node(markdown).to_html()
-  title = extract_title(markdown)
-  template = template.replace("{{ Title }}", title).replace("{{ Content }}", html)
-  with open(dest_path, "w") as f:
-    f.write(template)
+  document = parse_document(markdown)
+  write_output(dest_path, render_page(document, template))
 
 
-def generate_pages_recursive(content_dir_path: str, template_path: str, dest_dir_path: str):
-  print(f"Generating from {content_dir_path} to {dest_dir_path} using {template_path}...")
-  with open(template_path, "r") as f:
-    template = f.read()
+def local_image_paths(markdown_lines: Iterable[str], static_dir_path: str) -> list[str]:
+  # Site-absolute image URLs ("/images/a.png") are served from the static directory
+  paths = []
+  for line in markdown_lines:
+    for _, url in extract_markdown_images(line):
+      if url.startswith("/") and not url.startswith("//"):
+        url = url.split("#", 1)[0].split("?", 1)[0]
+        paths.append(os.path.normpath(os.path.join(static_dir_path, url.lstrip("/"))))
+  return paths
 
-  for root, _, files in os.walk(content_dir_path):
-    relative_path = os.path.relpath(root, content_dir_path)
-    dest_dir = os.path.join(dest_dir_path, relative_path)
 
-    os.makedirs(dest_dir, exist_ok=True)
+def page_inputs(
+  content_file_path: str, markdown: Union[str, None], template_path: str,
+  static_dir_path: Union[str, None]
+) -> list[str]:
+  inputs = [content_file_path, template_path]
+  if static_dir_path is None:
+    return inputs
+  if markdown is not None:
+    return inputs + local_image_paths([markdown], static_dir_path)
+  with open(content_file_path, "r", encoding="utf-8") as f:
+    return inputs + local_image_paths(f, static_dir_path)
 
-    for file_name in files:
-      content_file_path = os.path.join(root, file_name)
-      dest_file_path = os.path.join(dest_dir, file_name.replace(".md", ".html"))
 
-      with open(content_file_path, 'r') as f:
-        content = f.read()
+def generate_pages_recursive(
+  content_dir_path: str,
+  template_path: str,
+  dest_dir_path: str,
+  incremental: bool = False,
+  manifest_path: str = os.path.join(CACHE_DIR, "manifest.json"),
+  jobs: int = 1,
+  profile: BuildProfile = NULL_PROFILE,
+  stream_threshold: int = STREAM_THRESHOLD,
+  cache_path: Union[str, None] = None,
+  static_dir_path: Union[str, None] = None,
+  io_concurrency: int = 0,
+  queue_size: int = 32,
+  batch_bytes: int = BATCH_BYTES,
+  search_path: Union[str, None] = None,
+  search_state_path: Union[str, None] = None,
+  images: Union[dict, None] = None,
+  pages: Union[Iterable[tuple[str, str]], None] = None,
+  links_path: Union[str, None] = None,
+  links_state_path: Union[str, None] = None
+) -> list[tuple[str, str]]:
+  # With io_concurrency > 0 the build runs as an asyncio pipeline in this process, with
+  # that many concurrent reads and writes in flight; `jobs` and `profile` are not used.
+  # Otherwise pages are read as they are built; with jobs > 1 they go to the process pool
+  # in batches of about batch_bytes of markdown.
+  # With a search_path the search index of the site is written there. Each page's terms
+  # are kept in search_state_path, so incremental builds only re-tokenize rebuilt pages and
+  # a shard can leave its terms for the merge without writing an index of its own.
+  # `images` (from images.process_images) adds sizes and derivatives to <img> tags.
+  # `pages` limits the build to those (source, destination) pairs, e.g. one shard of a
+  # work manifest; incremental builds need the whole site and ignore it.
+  # With a links_path the sitewide link graph is written there and broken internal links
+  # are logged; like the search terms it is kept per page in links_state_path.
+  logger.info(f"Generating from {content_dir_path} to {dest_dir_path} using {template_path}...")
+  template = load_template(template_path)
+  written_before = output_stats()
+  graph = DependencyGraph.load(manifest_path) if incremental else DependencyGraph()
+  index = None
+  if search_path is not None or search_state_path is not None:
+    incremental_index = incremental and search_state_path is not None
+    index = SearchIndex.load(search_state_path) if incremental_index else SearchIndex()
+  link_graph = None
+  if links_path is not None or links_state_path is not None:
+    incremental_links = incremental and links_state_path is not None
+    link_graph = LinkGraph.load(links_state_path) if incremental_links else LinkGraph()
+  summaries = {} if index is not None or link_graph is not None else None
+  fingerprints = {os.path.normpath(template_path): template.digest}
+
+  def fingerprint(path: str) -> Union[str, None]:
+    path = os.path.normpath(path)
+    if path not in fingerprints:
+      fingerprints[path] = stat_fingerprint(path)
+    return fingerprints[path]
+
+  # Reverse lookups: every page that read a changed template or asset is stale. Sources
+  # are checked against their content hash while walking.
+  generator = generator_version()
+  rebuild_all = graph.generator != generator
+  stale = set()
+  for input_path, key in graph.inputs.items():
+    if input_path not in graph.pages and fingerprint(input_path) != key:
+      stale.update(graph.dependents(input_path))
+
+  whole_site = pages is None or incremental
+  if whole_site:
+    pages = walk_pages(content_dir_path, dest_dir_path)
+  seen = set()
+  inputs = {}
+
+  def read_source(content_file_path: str) -> Union[bytes, None]:
+    # Oversized sources are only hashed here (None); they are streamed when built
+    source = os.path.normpath(content_file_path)
+    if os.path.getsize(content_file_path) > stream_threshold:
+      fingerprints[source] = file_digest(content_file_path)
+      return None
+    with open(content_file_path, "rb") as f:
+      content_bytes = f.read()
+    fingerprints[source] = hash_bytes(content_bytes)
+    return content_bytes
+
+  def plan_page(
+    content_file_path: str, dest_file_path: str, content_bytes: Union[bytes, None]
+  ) -> Union[PageJob, None]:
+    source = os.path.normpath(content_file_path)
+    seen.add(source)
+    previous = graph.get_page(source)
+    if (
+      previous is not None and not rebuild_all and source not in stale and
+      graph.inputs.get(source) == fingerprints[source] and
+      is_same_output(previous["output"], dest_file_path) and
+      os.path.exists(dest_file_path) and
+      # Pages missing from the link graph, or parsed pages missing from the search index,
+      # rebuild; streamed pages are never in the index
+      (link_graph is None or source in link_graph) and
+      (content_bytes is None or index is None or source in index)
+    ):
+      return None
+    markdown = decode_text(content_bytes) if content_bytes is not None else None
+    inputs[content_file_path] = page_inputs(
+      content_file_path, markdown, template_path, static_dir_path
+    )
+    for input_path in inputs[content_file_path][2:]:
+      if fingerprint(input_path) is None:
+        logger.warning(f"{content_file_path}: missing image {input_path}")
+    return content_file_path, dest_file_path, markdown
+
+  cache = None
+  if cache_path is not None:
+    from cache import BlockCache
+    cache = BlockCache(cache_path)
+  try:
+    if io_concurrency > 0:
+      import asyncio
+      from pipeline import run_pipeline
+
+      def render(job: PageJob) -> Union[str, None]:
+        content_file_path, dest_file_path, markdown = job
+        if markdown is None:
+          document = build_page(
+            content_file_path, dest_file_path, None, template, cache=cache, images=images
+          )
+          html = None
+        else:
+          document = parse_document(markdown, cache=cache, images=images)
+          html = render_page(document, template)
+        if summaries is not None:
+          summaries[content_file_path] = page_summary(document, index is not None)
+        return html
+
+      dirty, errors = asyncio.run(
+        run_pipeline(
+          pages,
+          read_source,
+          plan_page,
+          render,
+          readers=io_concurrency,
+          writers=io_concurrency,
+          queue_size=queue_size
+        )
+      )
+      # Sources that failed to read still exist; keep their previous outputs
+      seen.update(os.path.normpath(path) for path, _ in errors)
+    else:
+      dirty = []
+      errors = []
+
+      def planned_jobs() -> Iterator[PageJob]:
+        # Pages are planned as they are built, so sources are not all read up front
+        for content_file_path, dest_file_path in pages:
+          try:
+            with profile.page(content_file_path), profile.stage("read"):
+              content_bytes = read_source(content_file_path)
+            job = plan_page(content_file_path, dest_file_path, content_bytes)
+          except (OSError, UnicodeDecodeError) as e:
+            # Like a failed page: reported, and its previous output is kept
+            errors.append((content_file_path, f"{type(e).__name__}: {e}"))
+            seen.add(os.path.normpath(content_file_path))
+            continue
+          if job is not None:
+            dirty.append((content_file_path, dest_file_path))
+            yield job
+
+      if jobs > 1:
+        build_errors = build_batches_parallel(
+          iter_batches(planned_jobs(), batch_bytes), template, jobs, profile, cache, summaries,
+          images, index is not None
+        )
+      else:
+        build_errors = build_batch(
+          planned_jobs(), template, profile, cache, summaries, images, index is not None
+        )
+      errors += build_errors
+    if cache is not None:
+      cache.flush()
+      logger.info(f"Block cache: {cache.stats()}")
+  finally:
+    if cache is not None:
+      cache.close()
+  # Sources that could not be read are among the errors but were never planned
+  failed = {content_file_path for content_file_path, _ in errors}
+  built = sum(1 for content_file_path, _ in dirty if content_file_path not in failed)
+  logger.info(f"Built {built} of {len(seen)} pages")
+  for content_file_path, message in errors:
+    logger.error(f"Error generating {content_file_path}: {message}")
+
+  for store in (index, link_graph):
+    if store is None:
+      continue
+    for content_file_path, dest_file_path in dirty:
+      summary = summaries.get(content_file_path)
+      if (
+        summary is None or content_file_path in failed or
+        (store is index and summary["terms"] is None)
+      ):
+        store.remove_page(content_file_path)
+        continue
+      url = page_url(dest_dir_path, dest_file_path)
+      if store is index:
+        index.set_page(content_file_path, url, summary["title"], summary["terms"])
+      else:
+        link_graph.set_page(
+          content_file_path, url, summary["title"], summary["links"], summary["anchors"]
+        )
+    for source in set(store.pages).difference(seen):
+      store.remove_page(source)
+
+  if search_path is not None and (index.changed or not os.path.exists(search_path)):
+    size = index.write(search_path)
+    logger.info(f"Search index: {len(index.pages)} pages, {size} bytes")
+  if search_state_path is not None and index.changed:
+    index.save(search_state_path)
+
+  # Links are only re-resolved when a page's links, anchors, title or url changed
+  if links_path is not None and (link_graph.changed or not os.path.exists(links_path)):
+    if whole_site:
+      # A subset of the site cannot tell a missing page from one built elsewhere
+      report_broken_links(link_graph, dest_dir_path)
+    link_graph.write(links_path)
+  if links_state_path is not None and link_graph.changed:
+    link_graph.save(links_state_path)
+
+  written = stats_since(written_before)
+  logger.info(
+    f"Wrote {written['bytes']} bytes to {written['written']} files, "
+    f"{written['unchanged']} unchanged"
+  )
+
+  if not incremental:
+    return errors
+
+  for content_file_path, dest_file_path in dirty:
+    previous = graph.get_page(content_file_path)
+    if content_file_path in failed:
+      # Failed pages drop out of the graph so the next incremental build retries them
+      graph.remove_page(content_file_path)
+      continue
+    if previous is not None and not is_same_output(previous["output"], dest_file_path):
+      remove_output(previous["output"])
+    graph.set_page(content_file_path, dest_file_path, inputs[content_file_path])
+    for input_path in inputs[content_file_path]:
+      graph.inputs[os.path.normpath(input_path)] = fingerprint(input_path)
+
+  # Outputs whose sources disappeared since the last build are stale
+  for source in set(graph.pages).difference(seen):
+    remove_output(graph.remove_page(source)["output"])
+  graph.prune_inputs()
+  graph.generator = generator
+  graph.save(manifest_path)
+  return errors
+
+
+def report_broken_links(link_graph: LinkGraph, dest_dir_path: str) -> list[tuple[str, str]]:
+  # Targets that are not pages are looked up among the files already in the destination,
+  # where static assets are synced before pages are built
+  def asset_exists(path: str) -> bool:
+    return os.path.isfile(os.path.join(dest_dir_path, path.lstrip("/")))
+
+  broken = link_graph.broken_links(asset_exists)
+  for source, target in broken:
+    logger.warning(f"{source}: broken link {target}")
+  return broken
+
+
+def is_same_output(path: str, other_path: str) -> bool:
+  # The same file spelled differently, e.g. under "./public" and "public" or via a symlink
+  if os.path.normpath(path) == os.path.normpath(other_path):
+    return True
+  try:
+    return os.path.samefile(path, other_path)
+  except OSError:
+    return False
+
+
+def remove_output(path: str):
+  if os.path.exists(path):
+    os.remove(path)
+
+
+def build_site(
+  content_dir_path: str = "content",
+  template_path: str = "template.html",
+  dest_dir_path: str = "public",
+  static_dir_path: str = "static",
+  cache_dir_path: str = CACHE_DIR,
+  jobs: int = 1,
+  profile: BuildProfile = NULL_PROFILE,
+  block_cache: bool = True,
+  io_concurrency: int = 0,
+  search_index: bool = True,
+  gzip: bool = False,
+  checksum: bool = False,
+  link: bool = False
+) -> list[tuple[str, str]]:
+  # The whole incremental build: static assets, images, pages, then the optional
+  # precompression of the output. All state is kept under cache_dir_path. `checksum` and
+  # `link` are passed to sync_directory for the static assets.
+  from images import process_images
+
+  stats = sync_directory(
+    static_dir_path, dest_dir_path, os.path.join(cache_dir_path, "assets.json"), checksum, link
+  )
+  logger.info(f"Synced static assets: {stats}")
+  search_path = os.path.join(dest_dir_path, "search.idx")
+  search_state_path = os.path.join(cache_dir_path, "search.json")
+  if not search_index:
+    # Pages are not tokenized at all, and an index from an earlier build would go stale
+    remove_output(search_path)
+    remove_output(search_state_path)
+    search_path = search_state_path = None
+  images = process_images(
+    static_dir_path, dest_dir_path, os.path.join(cache_dir_path, "images.json"),
+    os.path.join(cache_dir_path, "images")
+  )
+  errors = generate_pages_recursive(
+    content_dir_path,
+    template_path,
+    dest_dir_path,
+    incremental=True,
+    manifest_path=os.path.join(cache_dir_path, "manifest.json"),
+    jobs=jobs,
+    profile=profile,
+    cache_path=os.path.join(cache_dir_path, "blocks.sqlite") if block_cache else None,
+    static_dir_path=static_dir_path,
+    io_concurrency=io_concurrency,
+    search_path=search_path,
+    search_state_path=search_state_path,
+    images=images,
+    links_path=os.path.join(dest_dir_path, "links.json"),
+    links_state_path=os.path.join(cache_dir_path, "links.json")
+  )
+  if gzip:
+    from compress import precompress
 
-      html = markdown_to_html_node(content).to_html()
-      title = extract_title(content)
-      processed_content = template.replace("{{ Title }}", title).replace("{{ Content }}", html)
+    stats = precompress(dest_dir_path, os.path.join(cache_dir_path, "gzip.json"), jobs=jobs)
+    logger.info(f"Precompressed output: {stats}")
+  return errors
 
-      # Save the processed content to the destination file
-      with open(dest_file_path, 'w', encoding='utf-8') as f:
-        f.write(processed_content)
 
+def main(argv=None):
+  # Kept for `python3 src/main.py`; the same as `cli.py build`
+  from cli import main as cli_main
 
-def main():
-  copy_directory("./static", "./public")
-  generate_pages_recursive("content/", "template.html", "public/")
+  cli_main(["build", *(sys.argv[1:] if argv is None else argv)])
 
 
 if __name__ == "__main__":
@@ -0,0 +1,118 @@
+import os
+import json
+
+from contextlib import contextmanager
+from typing import Union
+
+# Per-process totals; pool workers report the difference made by each batch
+write_stats = {"written": 0, "unchanged": 0, "bytes": 0}
+
+
+def output_stats() -> dict[str, int]:
+  return dict(write_stats)
+
+
+def stats_since(before: dict[str, int]) -> dict[str, int]:
+  return {key: write_stats[key] - before[key] for key in write_stats}
+
+
+def merge_stats(delta: dict[str, int]):
+  for key, value in delta.items():
+    write_stats[key] += value
+
+
+def temp_path(path: str) -> str:
+  # Same directory as the destination, so os.replace is an atomic rename
+  return f"{path}.{os.getpid()}.tmp"
+
+
+def is_same_file_content(path: str, data: bytes) -> bool:
+  # Size first; the existing file is only read when the sizes match
+  try:
+    if os.path.getsize(path) != len(data):
+      return False
+    with open(path, "rb") as f:
+      return f.read() == data
+  except OSError:
+    return False
+
+
+def is_same_file(path: str, other_path: str, chunk_size: int = 1 << 20) -> bool:
+  try:
+    if os.path.getsize(path) != os.path.getsize(other_path):
+      return False
+    with open(path, "rb") as f, open(other_path, "rb") as other:
+      while True:
+        chunk = f.read(chunk_size)
+        if chunk != other.read(chunk_size):
+          return False
+        if not chunk:
+          return True
+  except OSError:
+    return False
+
+
+def write_output(path: str, data: Union[str, bytes]) -> int:
+  # Returns the bytes written: 0 when the file already holds exactly `data`
+  if isinstance(data, str):
+    data = data.encode("utf-8")
+  if is_same_file_content(path, data):
+    write_stats["unchanged"] += 1
+    return 0
+  replace_file(path, data)
+  write_stats["written"] += 1
+  write_stats["bytes"] += len(data)
+  return len(data)
+
+
+def replace_file(path: str, data: bytes):
+  # Readers see either the old file or the new one, never a partial write
+  os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+  tmp_path = temp_path(path)
+  try:
+    with open(tmp_path, "wb") as f:
+      f.write(data)
+    os.replace(tmp_path, path)
+  except BaseException:
+    if os.path.exists(tmp_path):
+      os.remove(tmp_path)
+    raise
+
+
+def read_state(path: str, default: Union[dict, list]) -> Union[dict, list]:
+  # State written by write_state, or `default` if it is missing or unreadable: a lost
+  # cache only costs a full rebuild
+  try:
+    with open(path, "r") as f:
+      return json.load(f)
+  except (OSError, ValueError):
+    return default
+
+
+def write_state(path: str, state: Union[dict, list], **options):
+  # Build state (manifests, caches of per-page data) as JSON; `options` go to json.dumps.
+  # Always written and not counted in the output stats, since it is not part of the site.
+  replace_file(path, json.dumps(state, **options).encode("utf-8"))
+
+
+@contextmanager
+def open_output(path: str):
+  # For output too large to hold in memory: written to a temp file, which then either
+  # replaces the destination or is dropped if the two are identical
+  os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+  tmp_path = temp_path(path)
+  try:
+    with open(tmp_path, "w", encoding="utf-8", newline="\n") as f:
+      yield f
+    if is_same_file(tmp_path, path):
+      os.remove(tmp_path)
+      write_stats["unchanged"] += 1
+      return
+    size = os.path.getsize(tmp_path)
+    os.replace(tmp_path, path)
+  except BaseException:
+    if os.path.exists(tmp_path):
+      os.remove(tmp_path)
+    raise
+  write_stats["written"] += 1
+  write_stats["bytes"] += size
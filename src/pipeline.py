@@ -0,0 +1,73 @@
+import asyncio
+
+from typing import Callable, Iterable, Union
+
+from output import write_output
+
+# (source path, destination path)
+PagePaths = tuple[str, str]
+
+
+async def run_pipeline(
+  pages: Iterable[PagePaths],
+  read: Callable[[str], object],
+  plan: Callable[[str, str, object], Union[tuple, None]],
+  render: Callable[[tuple], Union[str, None]],
+  readers: int = 8,
+  writers: int = 8,
+  queue_size: int = 32
+) -> tuple[list[PagePaths], list[tuple[str, str]]]:
+  # reader tasks --(render queue)--> render task --(write queue)--> writer tasks
+  #
+  # Reads and writes run on worker threads so their latency overlaps with rendering on
+  # the event loop. The bounded queues cap how many sources and rendered pages are held
+  # in memory at once. `plan` turns a read source into a job (or None to skip it) and
+  # `render` turns a job into HTML, or None when it wrote the page itself. Only the paths
+  # of planned jobs are returned; their sources are dropped once written.
+  render_queue = asyncio.Queue(queue_size)
+  write_queue = asyncio.Queue(queue_size)
+  pending = iter(pages)
+  planned = []
+  errors = []
+
+  async def reader():
+    for content_file_path, dest_file_path in pending:
+      try:
+        source = await asyncio.to_thread(read, content_file_path)
+        job = plan(content_file_path, dest_file_path, source)
+      except Exception as e:
+        errors.append((content_file_path, f"{type(e).__name__}: {e}"))
+        continue
+      if job is not None:
+        planned.append((content_file_path, dest_file_path))
+        await render_queue.put(job)
+
+  async def renderer():
+    while (job := await render_queue.get()) is not None:
+      try:
+        html = render(job)
+      except Exception as e:
+        errors.append((job[0], f"{type(e).__name__}: {e}"))
+        html = None
+      if html is not None:
+        await write_queue.put((job, html))
+      # Rendering is CPU-bound; let the reader and writer tasks move between pages
+      await asyncio.sleep(0)
+
+  async def writer():
+    while (item := await write_queue.get()) is not None:
+      job, html = item
+      try:
+        await asyncio.to_thread(write_output, job[1], html)
+      except Exception as e:
+        errors.append((job[0], f"{type(e).__name__}: {e}"))
+
+  render_task = asyncio.create_task(renderer())
+  writer_tasks = [asyncio.create_task(writer()) for _ in range(writers)]
+  await asyncio.gather(*(reader() for _ in range(readers)))
+  await render_queue.put(None)
+  await render_task
+  for _ in writer_tasks:
+    await write_queue.put(None)
+  await asyncio.gather(*writer_tasks)
+  return planned, errors
@@ -1,9 +1,10 @@
 import re
+import html
 
-from typing import Sequence
-from functools import partial
+from typing import Hashable, Iterable, Iterator, Sequence, TextIO, Union
 from textnode import TextNode, TextType
-from htmlnode import LeafNode, ParentNode, HTMLNode
+from htmlnode import LeafNode, ParentNode, HTMLNode, RawNode
+from profiling import NULL_PROFILE
 
 TEXT_DELIMITERS = [
   ("**", TextType.BOLD),
@@ -11,8 +12,31 @@ TEXT_DELIMITERS = [
   ("`", TextType.CODE),
 ]
 
-
-def text_node_to_html_node(text_node: TextNode) -> LeafNode:
+IMAGE_PATTERN = re.compile(r"!\[([^\[\]]*)\]\(([^\(\)]*)\)")
+LINK_PATTERN = re.compile(r"\[([^\[\]]*)\]\(([^\(\)]*)\)")
+INLINE_SPECIAL_PATTERN = re.compile(r"[*`!\[]")
+HEADING_PATTERN = re.compile(r"^(#{1,6})\s.+$")
+UNORDERED_ITEM_PATTERN = re.compile(r"^(\*|-) .+$")
+ORDERED_ITEM_PATTERN = re.compile(r"^(\d+)\. .+$")
+ANCHOR_STRIP_PATTERN = re.compile(r"[^\w\s-]")
+ANCHOR_SPACE_PATTERN = re.compile(r"[\s_-]+")
+HREF_PATTERN = re.compile(r'<a href="([^"]*)"')
+
+
+def image_props(url: str, alt: str, images: Union[dict, None] = None) -> dict[str, str]:
+  # `images` maps site URLs to what the image stage found (images.process_images)
+  image = images.get(url) if images is not None else None
+  if image is None:
+    return {"src": url, "alt": alt}
+  props = {"src": url, "alt": alt, "width": str(image["width"]), "height": str(image["height"])}
+  if image["derivatives"]:
+    props["src"] = image["derivatives"][-1][0]
+    sources = image["derivatives"] + [(url, image["width"])]
+    props["srcset"] = ", ".join(f"{source} {width}w" for source, width in sources)
+  return props
+
+
+def text_node_to_html_node(text_node: TextNode, images: Union[dict, None] = None) -> LeafNode:
   match text_node.text_type:
     case TextType.NORMAL:
       return LeafNode(text_node.text)
@@ -25,17 +49,17 @@ def text_node_to_html_node(text_node: TextNode) -> LeafNode:
     case TextType.LINK:
       return LeafNode(tag="a", value=text_node.text, props={"href": text_node.url})
     case TextType.IMAGE:
-      return LeafNode(tag="img", value="", props={"src": text_node.url, "alt": text_node.text})
+      return LeafNode(tag="img", value="", props=image_props(text_node.url, text_node.text, images))
     case _:
       raise Exception(f"text_type {text_node.text_type} is outside of TextType enum")
 
 
 def extract_markdown_images(text):
-  return re.findall(r"!\[([^\[\]]*)\]\(([^\(\)]*)\)", text)
+  return IMAGE_PATTERN.findall(text)
 
 
 def extract_markdown_links(text):
-  return re.findall(r"\[([^\[\]]*)\]\(([^\(\)]*)\)", text)
+  return LINK_PATTERN.findall(text)
 
 
 def split_nodes_delimiter(old_nodes: list[TextNode], delimiter: str,
@@ -58,137 +82,427 @@ def split_nodes_delimiter(old_nodes: list[TextNode], delimiter: str,
   return out_list
 
 
-def split_nodes_image(old_nodes: list[TextNode]) -> list[TextNode]:
+def split_nodes_pattern(old_nodes: list[TextNode], pattern: re.Pattern,
+                        text_type: TextType) -> list[TextNode]:
   out_list = []
   for node in old_nodes:
     if node.text_type == TextType.NORMAL:
-      image_links = extract_markdown_images(node.text)
       text = node.text
-      for image_alt, image_link in image_links:
-        pat = f"![{image_alt}]({image_link})"
-        sections = text.split(pat, 1)
-        if sections[0] == "":
-          continue
-        out_list.append(TextNode(sections[0], TextType.NORMAL))
-        out_list.append(TextNode(image_alt, TextType.IMAGE, image_link))
-        text = sections[-1]
-      if len(text) > 0:
-        out_list.append(TextNode(text, TextType.NORMAL))
+      position = 0
+      for match in pattern.finditer(text):
+        if match.start() > position:
+          out_list.append(TextNode(text[position:match.start()], TextType.NORMAL))
+        out_list.append(TextNode(match.group(1), text_type, match.group(2)))
+        position = match.end()
+      if position < len(text):
+        out_list.append(TextNode(text[position:], TextType.NORMAL))
     else:
       out_list.append(node)
   return out_list
 
 
+def split_nodes_image(old_nodes: list[TextNode]) -> list[TextNode]:
+  return split_nodes_pattern(old_nodes, IMAGE_PATTERN, TextType.IMAGE)
+
+
 def split_nodes_link(old_nodes: list[TextNode]) -> list[TextNode]:
+  return split_nodes_pattern(old_nodes, LINK_PATTERN, TextType.LINK)
+
+
+def tokenize_inline(text: str) -> list[TextNode]:
+  # One left-to-right walk in place of the chained split_nodes_* passes. Where spans
+  # overlap, the leftmost one wins and its text is kept verbatim: a link or image binds
+  # before any emphasis inside it ("[*a*](u)" is a link with the text "*a*"), and a code
+  # span protects the delimiters inside it ("`a*b`" is code). The chained passes applied
+  # **, *, ` and then images and links in that fixed order, so these inputs differ;
+  # everything without overlapping spans tokenizes the same.
   out_list = []
-  for node in old_nodes:
-    if node.text_type == TextType.NORMAL:
-      image_links = extract_markdown_links(node.text)
-      text = node.text
-      for image_alt, image_link in image_links:
-        pat = f"[{image_alt}]({image_link})"
-        sections = text.split(pat, 1)
-        if sections[0] == "":
-          continue
-        out_list.append(TextNode(sections[0], TextType.NORMAL))
-        out_list.append(TextNode(image_alt, TextType.LINK, image_link))
-        text = sections[-1]
-      if len(text) > 0:
-        out_list.append(TextNode(text, TextType.NORMAL))
+  start = 0
+  position = 0
+  length = len(text)
+  while position < length:
+    special = INLINE_SPECIAL_PATTERN.search(text, position)
+    if special is None:
+      break
+    index = special.start()
+    char = text[index]
+
+    if char == "!" or char == "[":
+      if char == "!":
+        pattern, text_type = IMAGE_PATTERN, TextType.IMAGE
+      else:
+        pattern, text_type = LINK_PATTERN, TextType.LINK
+      match = pattern.match(text, index)
+      if match is None:
+        position = index + 1
+        continue
+      if index > start:
+        out_list.append(TextNode(text[start:index], TextType.NORMAL))
+      out_list.append(TextNode(match.group(1), text_type, match.group(2)))
+      start = position = match.end()
+      continue
+
+    if char == "`":
+      delimiter, text_type = "`", TextType.CODE
+    elif text.startswith("**", index):
+      delimiter, text_type = "**", TextType.BOLD
     else:
-      out_list.append(node)
+      delimiter, text_type = "*", TextType.ITALIC
+    end = text.find(delimiter, index + len(delimiter))
+    if end == -1:
+      raise Exception(f"Invalid markdown format, unmatched delimiter {delimiter}")
+    if index > start:
+      out_list.append(TextNode(text[start:index], TextType.NORMAL))
+    if end > index + len(delimiter):
+      out_list.append(TextNode(text[index + len(delimiter):end], text_type))
+    start = position = end + len(delimiter)
+
+  if start < length:
+    out_list.append(TextNode(text[start:], TextType.NORMAL))
   return out_list
 
 
 def text_to_textnodes(text: str) -> list[TextNode]:
-  nodes = [TextNode(text, TextType.NORMAL)]
-  functions = [
-    partial(split_nodes_delimiter, delimiter=delim, text_type=tt) for (delim, tt) in TEXT_DELIMITERS
-  ]
-  functions.extend([split_nodes_image, split_nodes_link])
-  for f in functions:
-    nodes = f(nodes)
-  return nodes
+  return tokenize_inline(text)
 
 
 def markdown_to_blocks(markdown: str) -> list[str]:
   return list(filter(lambda x: len(x) > 0, map(str.strip, markdown.split("\n\n"))))
 
 
-def block_to_block_type(block: str) -> str:
-  if re.match(r"^(#{1,6})\s.+$", block):
-    return "heading"
-
-  if block.startswith("```") and block.endswith("```"):
-    return "code"
-
-  if all(line.startswith(">") for line in block.splitlines()):
-    return "quote"
+def iter_blocks(lines: Iterable[str]) -> Iterator[str]:
+  # Yields the same blocks as markdown_to_blocks from lines that keep their line endings
+  # (e.g. a text file handle), holding at most one block in memory.
+  block_lines = []
+  for line in lines:
+    if line == "\n" and block_lines and block_lines[-1].endswith("\n"):
+      block = "".join(block_lines).strip()
+      if block:
+        yield block
+      block_lines = []
+    else:
+      block_lines.append(line)
+  block = "".join(block_lines).strip()
+  if block:
+    yield block
 
-  if all(re.match(r"^(\*|-) .+$", line) for line in block.splitlines()):
-    return "unordered_list"
 
+def classify_block(block: str) -> tuple[str, list[str]]:
+  # Every block type but paragraph is decided by the first character, so dispatch on it
+  # and split the lines once; the lines are handed on to block_to_html_node.
   lines = block.splitlines()
-  if all(re.match(r"^\d+\. .+$", line) for line in lines):
-    numbers = [int(line.split('.')[0]) for line in lines]
-    if numbers == list(range(1, len(numbers) + 1)):
-      return "ordered_list"
+  match block[0]:
+    case "#":
+      if HEADING_PATTERN.match(block):
+        return "heading", lines
+    case "`":
+      if block.startswith("```") and block.endswith("```"):
+        return "code", lines
+    case ">":
+      if all(line.startswith(">") for line in lines):
+        return "quote", lines
+    case "*" | "-":
+      if all(UNORDERED_ITEM_PATTERN.match(line) for line in lines):
+        return "unordered_list", lines
+    case first if first.isdigit():
+      for number, line in enumerate(lines, 1):
+        match = ORDERED_ITEM_PATTERN.match(line)
+        if match is None or int(match.group(1)) != number:
+          break
+      else:
+        return "ordered_list", lines
 
   # If none of the above conditions are met, it's a normal paragraph
-  return "paragraph"
+  return "paragraph", lines
+
+
+def block_to_block_type(block: str) -> str:
+  return classify_block(block)[0]
 
 
-def text_to_children(text: str) -> Sequence[HTMLNode]:
+def text_to_children(text: str, images: Union[dict, None] = None) -> Sequence[HTMLNode]:
   text_nodes = text_to_textnodes(text)
-  html_nodes = [text_node_to_html_node(text_node) for text_node in text_nodes]
+  html_nodes = [text_node_to_html_node(text_node, images) for text_node in text_nodes]
   return html_nodes
 
 
-def markdown_to_html_node(markdown: str) -> HTMLNode:
-  blocks = markdown_to_blocks(markdown)
+def block_to_html_node(
+  block: str,
+  block_type: str,
+  lines: Union[list[str], None] = None,
+  images: Union[dict, None] = None
+) -> HTMLNode:
+  if lines is None:
+    lines = block.splitlines()
+  match block_type:
+    case "heading":
+      level = heading_level(block)
+      text = block[level + 1:]
+      children = text_to_children(text, images)
+      return ParentNode(tag=f"h{level}", children=children)
+    case "paragraph":
+      text = " ".join(lines)
+      children = text_to_children(text, images)
+      return ParentNode(tag="p", children=children)
+    case "code":
+      if not block.startswith("```") or not block.endswith("```"):
+        raise ValueError("Invalid code block")
+      text = block[4:-3]
+      children = text_to_children(text, images)
+      return ParentNode(tag="pre", children=[ParentNode(tag="code", children=children)])
+    case "ordered_list":
+      items = [
+        ParentNode("li", text_to_children(item[item.index(" ") + 1:], images)) for item in lines
+      ]
+      return ParentNode("ol", items)
+    case "unordered_list":
+      items = [ParentNode("li", text_to_children(item[2:], images)) for item in lines]
+      return ParentNode("ul", items)
+    case "quote":
+      new_lines = []
+      for line in lines:
+        if not line.startswith(">"):
+          raise ValueError("Invalid quote block")
+        new_lines.append(line.lstrip(">").strip())
+      content = " ".join(new_lines)
+      children = text_to_children(content, images)
+      return ParentNode("blockquote", children)
+    case _:
+      raise ValueError(f"Invalid block type {block_type}")
+
+
+def cached_block_to_html_node(
+  block: str, cache, images: Union[dict, None] = None, profile=NULL_PROFILE
+) -> HTMLNode:
+  # `cache` maps block text to rendered HTML through get(block) / put(block, html). Lookups
+  # are timed as block_cache; misses are classified and parsed under the usual stages.
+  uncached = images is not None and "![" in block
+  if not uncached:
+    if profile.enabled:
+      with profile.stage("block_cache"):
+        html = cache.get(block)
+    else:
+      # Hits are most blocks of a warm build; they skip even the no-op stage context
+      html = cache.get(block)
+    if html is not None:
+      return RawNode(html)
+  with profile.stage("block_classify"):
+    block_type, lines = classify_block(block)
+  with profile.stage("inline_parse"):
+    if uncached:
+      # Image attributes depend on the image files, not only on the block text
+      return block_to_html_node(block, block_type, lines, images)
+    node = block_to_html_node(block, block_type, lines)
+  with profile.stage("block_cache"):
+    cache.put(block, node.to_html())
+  return node
+
+
+class Document:
+  # Everything the single walk over a document's blocks produces: the HTML tree (None for
+  # a document streamed straight to its output), the title (see document_title; None if
+  # there is none), every heading as (level, text, anchor id) and the target of every link
+  # in order
+  __slots__ = ("node", "title", "headings", "links")
+
+  def __init__(
+    self,
+    node: HTMLNode,
+    title: Union[str, None],
+    headings: list[tuple[int, str, str]],
+    links: list[str]
+  ) -> None:
+    self.node = node
+    self.title = title
+    self.headings = headings
+    self.links = links
+
+  def require_title(self) -> str:
+    if self.title is None:
+      raise ValueError("No H1 header found")
+    return self.title
+
+  def __repr__(self) -> str:
+    return f"Document({self.title!r}, {len(self.headings)} headings, {len(self.links)} links)"
+
+
+def heading_level(block: str) -> int:
+  return len(block) - len(block.lstrip("#"))
+
+
+def plain_text(text: str) -> str:
+  # Inline markdown reduced to the text a reader sees
+  return "".join(text_node.text for text_node in text_to_textnodes(text))
+
+
+def heading_anchor(text: str, anchors: set[str]) -> str:
+  # Lowercase, punctuation dropped and runs of spaces or dashes turned into one dash;
+  # repeats within a page get -1, -2, ... appended
+  slug = ANCHOR_SPACE_PATTERN.sub("-", ANCHOR_STRIP_PATTERN.sub("", plain_text(text).lower()))
+  slug = slug.strip("-") or "section"
+  anchor, suffix = slug, 0
+  while anchor in anchors:
+    suffix += 1
+    anchor = f"{slug}-{suffix}"
+  anchors.add(anchor)
+  return anchor
+
+
+def heading_to_html_node(
+  block: str, anchors: set[str], images: Union[dict, None] = None
+) -> tuple[HTMLNode, tuple[int, str, str]]:
+  node = block_to_html_node(block, "heading", None, images)
+  level = heading_level(block)
+  text = block[level + 1:].strip()
+  node.props = {"id": heading_anchor(text, anchors)}
+  return node, (level, text, node.props["id"])
+
+
+def node_links(node: HTMLNode) -> Iterator[str]:
+  # Cached blocks only keep their markup, so their targets are read back from it
+  if isinstance(node, RawNode):
+    for href in HREF_PATTERN.findall(node.value):
+      yield html.unescape(href)
+  elif node.children is not None:
+    for child in node.children:
+      yield from node_links(child)
+  elif node.tag == "a":
+    yield node.props["href"]
+
+
+def is_heading(block: str) -> bool:
+  return block[0] == "#" and HEADING_PATTERN.match(block) is not None
+
+
+def paragraph_title(block: str) -> Union[str, None]:
+  # "# Title\nSubtitle" is one paragraph, not a heading, but its first line still names
+  # the page. Code blocks start with ``` and never match.
+  if block.startswith("# "):
+    return block.partition("\n")[0][2:].strip() or None
+  return None
+
+
+def document_title(
+  headings: list[tuple[int, str, str]], fallback: Union[str, None]
+) -> Union[str, None]:
+  # The first h1 block; failing that, the first paragraph_title
+  return next((text for level, text, _ in headings if level == 1), fallback)
+
+
+def scan_document(lines: Iterable[str]) -> Document:
+  # The title and headings parse_document would record, without rendering anything: lets a
+  # streamed document know them before its body is written. There is no tree and links are
+  # left for the rendering pass to fill in.
+  headings = []
+  anchors = set()
+  fallback = None
+  for block in iter_blocks(lines):
+    if is_heading(block):
+      level = heading_level(block)
+      text = block[level + 1:].strip()
+      headings.append((level, text, heading_anchor(text, anchors)))
+    elif fallback is None:
+      fallback = paragraph_title(block)
+  return Document(None, document_title(headings, fallback), headings, [])
+
+
+def parse_document(
+  markdown: str, profile=NULL_PROFILE, cache=None, images: Union[dict, None] = None
+) -> Document:
+  with profile.stage("block_split"):
+    blocks = markdown_to_blocks(markdown)
+  headings = []
+  links = []
+  anchors = set()
   html_nodes = []
-  for block in blocks:
-    block_type = block_to_block_type(block)
-    match block_type:
-      case "heading":
-        level = block.count("#")
-        text = block[level + 1:]
-        children = text_to_children(text)
-        html_nodes.append(ParentNode(tag=f"h{level}", children=children))
-      case "paragraph":
-        text = " ".join(block.splitlines())
-        children = text_to_children(text)
-        html_nodes.append(ParentNode(tag="p", children=children))
-      case "code":
-        if not block.startswith("```") or not block.endswith("```"):
-          raise ValueError("Invalid code block")
-        text = block[4:-3]
-        children = text_to_children(text)
-        html_nodes.append(
-          ParentNode(tag="pre", children=[ParentNode(tag="code", children=children)])
-        )
-      case "ordered_list":
-        items = block.splitlines()
-        items = [ParentNode("li", text_to_children(item[3:])) for item in items]
-        html_nodes.append(ParentNode("ol", items))
-      case "unordered_list":
-        items = block.splitlines()
-        items = [ParentNode("li", text_to_children(item[2:])) for item in items]
-        html_nodes.append(ParentNode("ul", items))
-      case "quote":
-        lines = block.splitlines()
-        new_lines = []
-        for line in lines:
-          if not line.startswith(">"):
-            raise ValueError("Invalid quote block")
-          new_lines.append(line.lstrip(">").strip())
-        content = " ".join(new_lines)
-        children = text_to_children(content)
-        html_nodes.append(ParentNode("blockquote", children))
-      case _:
-        raise ValueError(f"Invalid block type {block_type}")
-
-  return ParentNode("div", html_nodes)
+  fallback = None
+  if cache is not None:
+    for block in blocks:
+      if is_heading(block):
+        # Anchor ids depend on the headings before them, so headings are not cached
+        with profile.stage("inline_parse"):
+          node, heading = heading_to_html_node(block, anchors, images)
+        headings.append(heading)
+      else:
+        node = cached_block_to_html_node(block, cache, images, profile)
+        if fallback is None:
+          fallback = paragraph_title(block)
+      html_nodes.append(node)
+      if "](" in block:
+        links.extend(node_links(node))
+  else:
+    with profile.stage("block_classify"):
+      classified = [classify_block(block) for block in blocks]
+    with profile.stage("inline_parse"):
+      for block, (block_type, lines) in zip(blocks, classified):
+        if block_type == "heading":
+          node, heading = heading_to_html_node(block, anchors, images)
+          headings.append(heading)
+        else:
+          node = block_to_html_node(block, block_type, lines, images)
+          if fallback is None:
+            fallback = paragraph_title(block)
+        html_nodes.append(node)
+        if "](" in block:
+          links.extend(node_links(node))
+  title = document_title(headings, fallback)
+  return Document(ParentNode("div", html_nodes), title, headings, links)
+
+
+def markdown_to_html_node(
+  markdown: str, profile=NULL_PROFILE, cache=None, images: Union[dict, None] = None
+) -> HTMLNode:
+  return parse_document(markdown, profile, cache, images).node
+
+
+def write_markdown_html(
+  lines: Iterable[str],
+  out: TextIO,
+  cache=None,
+  images: Union[dict, None] = None,
+  links: Union[list[str], None] = None
+):
+  # Streaming counterpart of markdown_to_html_node(...).write_html(out); link targets are
+  # appended to `links` in order, as parse_document records them
+  out.write("<div>")
+  empty = True
+  anchors = set()
+  for block in iter_blocks(lines):
+    if is_heading(block):
+      node = heading_to_html_node(block, anchors, images)[0]
+    elif cache is not None:
+      node = cached_block_to_html_node(block, cache, images)
+    else:
+      block_type, block_lines = classify_block(block)
+      node = block_to_html_node(block, block_type, block_lines, images)
+    node.write_html(out)
+    if links is not None and "](" in block:
+      links.extend(node_links(node))
+    empty = False
+  if empty:
+    raise ValueError("Parent nodes must have at least one child")
+  out.write("</div>")
+
+
+def toc_node(headings: list[tuple[int, str, str]], min_level: int = 2) -> Union[HTMLNode, None]:
+  # Nested <ul> of links to the headings at min_level and below; the h1 is the page title
+  items = []
+  open_items = []
+  for level, text, anchor in headings:
+    if level < min_level:
+      continue
+    while open_items and open_items[-1][0] >= level:
+      open_items.pop()
+    item = ParentNode("li", [LeafNode(plain_text(text), "a", {"href": f"#{anchor}"})])
+    if open_items:
+      parent = open_items[-1][1]
+      if len(parent.children) == 1:
+        parent.children.append(ParentNode("ul", []))
+      parent.children[1].children.append(item)
+    else:
+      items.append(item)
+    open_items.append((level, item))
+  return ParentNode("ul", items) if items else None
 
 
 def extract_title(markdown: str) -> str:
@@ -199,3 +513,33 @@ def extract_title(markdown: str) -> str:
       return line[2:].strip()  # Remove the '# ' and any leading/trailing whitespace
 
   raise ValueError("No H1 header found")
+
+
+# (id, title, html, error)
+RenderedDocument = tuple[Hashable, Union[str, None], Union[str, None], Union[str, None]]
+
+
+def render_document(document: tuple[Hashable, str]) -> RenderedDocument:
+  # A document that fails is reported in its own result instead of ending the batch
+  document_id, markdown = document
+  try:
+    document = parse_document(markdown)
+    return document_id, document.require_title(), document.node.to_html(), None
+  except Exception as e:
+    return document_id, None, None, f"{type(e).__name__}: {e}"
+
+
+def render_documents(
+  documents: Iterable[tuple[Hashable, str]], jobs: int = 1, chunksize: int = 16
+) -> Iterator[RenderedDocument]:
+  # Batch API: (id, markdown) pairs in, (id, title, html, error) out, in input order.
+  # error is None on success; otherwise title and html are None and error is the
+  # "ExceptionType: message" the build reports for the page. With jobs > 1 documents are
+  # rendered on a process pool, `chunksize` at a time per task.
+  if jobs <= 1:
+    yield from map(render_document, documents)
+    return
+  from concurrent.futures import ProcessPoolExecutor
+
+  with ProcessPoolExecutor(max_workers=jobs) as executor:
+    yield from executor.map(render_document, documents, chunksize=chunksize)
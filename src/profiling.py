@@ -0,0 +1,85 @@
+import time
+
+from contextlib import contextmanager, nullcontext
+from typing import Union
+
+BUILD_STAGES = [
+  "read", "block_split", "block_classify", "inline_parse", "serialize", "template", "write"
+]
+
+
+class NullProfile:
+  # Stand-in used when profiling is off; every stage is a shared no-op context
+  enabled = False
+  _context = nullcontext()
+
+  def stage(self, name: str):
+    return self._context
+
+  def page(self, path: str):
+    return self._context
+
+
+NULL_PROFILE = NullProfile()
+
+
+class BuildProfile:
+  enabled = True
+
+  def __init__(self) -> None:
+    self.stages: dict[str, list] = {}
+    self.pages: dict[str, dict[str, float]] = {}
+    self.current_page: Union[str, None] = None
+
+  @contextmanager
+  def page(self, path: str):
+    previous, self.current_page = self.current_page, path
+    self.pages.setdefault(path, {})
+    try:
+      yield
+    finally:
+      self.current_page = previous
+
+  @contextmanager
+  def stage(self, name: str):
+    start = time.perf_counter()
+    try:
+      yield
+    finally:
+      self.record(name, time.perf_counter() - start)
+
+  def record(self, name: str, seconds: float, calls: int = 1):
+    totals = self.stages.setdefault(name, [0.0, 0])
+    totals[0] += seconds
+    totals[1] += calls
+    if self.current_page is not None:
+      page = self.pages[self.current_page]
+      page[name] = page.get(name, 0.0) + seconds
+
+  def merge(self, other: "BuildProfile"):
+    for name, (seconds, calls) in other.stages.items():
+      totals = self.stages.setdefault(name, [0.0, 0])
+      totals[0] += seconds
+      totals[1] += calls
+    for path, stages in other.pages.items():
+      page = self.pages.setdefault(path, {})
+      for name, seconds in stages.items():
+        page[name] = page.get(name, 0.0) + seconds
+
+  def slowest_pages(self, count: int = 10) -> list[tuple[str, float]]:
+    totals = [(path, sum(stages.values())) for path, stages in self.pages.items()]
+    return sorted(totals, key=lambda item: item[1], reverse=True)[:count]
+
+  def report(self, slowest: int = 10) -> str:
+    order = BUILD_STAGES + sorted(set(self.stages).difference(BUILD_STAGES))
+    lines = [f"{'stage':<16}{'calls':>8}{'total ms':>12}{'avg us':>12}"]
+    for name in order:
+      if name not in self.stages:
+        continue
+      seconds, calls = self.stages[name]
+      lines.append(f"{name:<16}{calls:>8}{seconds * 1000:>12.2f}{seconds / calls * 1e6:>12.1f}")
+    if self.pages:
+      lines.append(f"slowest {min(slowest, len(self.pages))} of {len(self.pages)} pages:")
+      for path, seconds in self.slowest_pages(slowest):
+        lines.append(f"  {seconds * 1000:>10.2f} ms  {path}")
+    return "\n".join(lines)
@@ -0,0 +1,200 @@
+import os
+import re
+import html
+
+from typing import Iterator, Union
+
+from htmlnode import HTMLNode, RawNode
+from output import read_state, write_output, write_state
+
+INDEX_MAGIC = b"SIDX"
+INDEX_FORMAT = 1
+STATE_VERSION = 1
+TERM_PATTERN = re.compile(r"\w+")
+TAG_PATTERN = re.compile(r"<[^>]*>")
+
+# Encoded index layout; every integer is an unsigned LEB128 varint and every string a
+# varint byte length followed by UTF-8:
+#
+#   "SIDX" format
+#   page count, then (url, title) per page id
+#   term count, then per term in sorted order:
+#     length of the prefix shared with the previous term, rest of the term
+#     posting count, then per posting: page id delta, position count, position deltas
+
+
+def encode_varint(value: int, out: bytearray):
+  while value > 0x7f:
+    out.append(value & 0x7f | 0x80)
+    value >>= 7
+  out.append(value)
+
+
+def decode_varint(data: bytes, offset: int) -> tuple[int, int]:
+  value = shift = 0
+  while True:
+    byte = data[offset]
+    offset += 1
+    value |= (byte & 0x7f) << shift
+    if byte < 0x80:
+      return value, offset
+    shift += 7
+
+
+def encode_string(value: str, out: bytearray):
+  encoded = value.encode("utf-8")
+  encode_varint(len(encoded), out)
+  out += encoded
+
+
+def decode_string(data: bytes, offset: int) -> tuple[str, int]:
+  length, offset = decode_varint(data, offset)
+  return data[offset:offset + length].decode("utf-8"), offset + length
+
+
+def node_text(node: HTMLNode) -> Iterator[str]:
+  # Cached blocks come back as RawNodes, so their text is recovered from the markup
+  if isinstance(node, RawNode):
+    yield html.unescape(TAG_PATTERN.sub(" ", node.value))
+  elif node.children is not None:
+    for child in node.children:
+      yield from node_text(child)
+  elif node.value:
+    yield node.value
+
+
+def page_postings(node: HTMLNode) -> dict[str, list[int]]:
+  postings = {}
+  position = 0
+  for text in node_text(node):
+    for match in TERM_PATTERN.finditer(text):
+      postings.setdefault(match.group().casefold(), []).append(position)
+      position += 1
+  return postings
+
+
+def page_url(dest_dir_path: str, dest_file_path: str) -> str:
+  url = "/" + os.path.relpath(dest_file_path, dest_dir_path).replace(os.sep, "/")
+  return url[:-len("index.html")] if url.endswith("/index.html") else url
+
+
+class SearchIndex:
+  def __init__(self) -> None:
+    # source -> {"url", "title", "terms": {term: [positions]}}
+    self.pages: dict[str, dict] = {}
+    # Whether a page was added, changed or removed since the index was created or loaded;
+    # an unchanged index is neither re-encoded nor saved
+    self.changed = False
+
+  def set_page(self, source: str, url: str, title: str, terms: dict[str, list[int]]):
+    page = {"url": url, "title": title, "terms": terms}
+    source = os.path.normpath(source)
+    if self.pages.get(source) != page:
+      self.pages[source] = page
+      self.changed = True
+
+  def remove_page(self, source: str) -> Union[dict, None]:
+    page = self.pages.pop(os.path.normpath(source), None)
+    if page is not None:
+      self.changed = True
+    return page
+
+  def __contains__(self, source: str) -> bool:
+    return os.path.normpath(source) in self.pages
+
+  def encode(self) -> bytes:
+    # Only changed pages are re-tokenized between builds; encoding the postings of the
+    # whole site from the stored per-page terms is a single linear pass
+    pages = sorted(self.pages.values(), key=lambda page: page["url"])
+    postings: dict[str, list[tuple[int, list[int]]]] = {}
+    out = bytearray(INDEX_MAGIC)
+    out.append(INDEX_FORMAT)
+    encode_varint(len(pages), out)
+    for page_id, page in enumerate(pages):
+      encode_string(page["url"], out)
+      encode_string(page["title"], out)
+      for term, positions in page["terms"].items():
+        postings.setdefault(term, []).append((page_id, positions))
+
+    encode_varint(len(postings), out)
+    previous_term = ""
+    for term in sorted(postings):
+      shared = len(os.path.commonprefix([previous_term, term]))
+      encode_varint(shared, out)
+      encode_string(term[shared:], out)
+      previous_term = term
+      encode_varint(len(postings[term]), out)
+      previous_page = 0
+      for page_id, positions in postings[term]:
+        encode_varint(page_id - previous_page, out)
+        previous_page = page_id
+        encode_varint(len(positions), out)
+        previous_position = 0
+        for position in positions:
+          encode_varint(position - previous_position, out)
+          previous_position = position
+    return bytes(out)
+
+  def write(self, path: str) -> int:
+    data = self.encode()
+    write_output(path, data)
+    return len(data)
+
+  @classmethod
+  def load(cls, path: str) -> "SearchIndex":
+    index = cls()
+    data = read_state(path, {})
+    if data.get("version") == STATE_VERSION:
+      index.pages = data["pages"]
+    return index
+
+  def save(self, path: str):
+    write_state(path, {"version": STATE_VERSION, "pages": self.pages}, separators=(",", ":"))
+
+
+def decode_index(
+  data: bytes
+) -> tuple[list[tuple[str, str]], dict[str, list[tuple[int, list[int]]]]]:
+  if data[:len(INDEX_MAGIC)] != INDEX_MAGIC or data[len(INDEX_MAGIC)] != INDEX_FORMAT:
+    raise ValueError("Not a search index")
+  offset = len(INDEX_MAGIC) + 1
+  page_count, offset = decode_varint(data, offset)
+  pages = []
+  for _ in range(page_count):
+    url, offset = decode_string(data, offset)
+    title, offset = decode_string(data, offset)
+    pages.append((url, title))
+
+  postings = {}
+  term_count, offset = decode_varint(data, offset)
+  term = ""
+  for _ in range(term_count):
+    shared, offset = decode_varint(data, offset)
+    suffix, offset = decode_string(data, offset)
+    term = term[:shared] + suffix
+    posting_count, offset = decode_varint(data, offset)
+    entries = []
+    page_id = 0
+    for _ in range(posting_count):
+      delta, offset = decode_varint(data, offset)
+      page_id += delta
+      position_count, offset = decode_varint(data, offset)
+      positions = []
+      position = 0
+      for _ in range(position_count):
+        delta, offset = decode_varint(data, offset)
+        position += delta
+        positions.append(position)
+      entries.append((page_id, positions))
+    postings[term] = entries
+  return pages, postings
+
+
+def search(data: bytes, query: str) -> list[str]:
+  # URLs of the pages containing every term of the query
+  pages, postings = decode_index(data)
+  matches = None
+  for match in TERM_PATTERN.finditer(query):
+    page_ids = {page_id for page_id, _ in postings.get(match.group().casefold(), ())}
+    matches = page_ids if matches is None else matches & page_ids
+  return [pages[page_id][0] for page_id in sorted(matches or ())]
@@ -0,0 +1,203 @@
+import os
+import sys
+import heapq
+import json
+import logging
+import argparse
+import subprocess
+
+from typing import Union
+
+from main import generate_pages_recursive, report_broken_links, walk_pages
+from assets import sync_directory
+from images import process_images
+from search import SearchIndex
+from links import LinkGraph
+from output import write_state
+
+logger = logging.getLogger(__name__)
+
+WORK_MANIFEST_VERSION = 1
+
+
+def assign_shards(sizes: dict[str, int], shards: int) -> dict[str, int]:
+  # Greedy longest-processing-time assignment: the largest remaining page goes to the
+  # shard with the fewest bytes so far. Ties break on path and shard number, so the same
+  # tree always yields the same assignment.
+  loads = [(0, shard) for shard in range(shards)]
+  assignment = {}
+  for source in sorted(sizes, key=lambda source: (-sizes[source], source)):
+    load, shard = heapq.heappop(loads)
+    assignment[source] = shard
+    heapq.heappush(loads, (load + sizes[source], shard))
+  return assignment
+
+
+def plan_build(
+  content_dir_path: str,
+  template_path: str,
+  dest_dir_path: str,
+  manifest_path: str,
+  shards: int,
+  static_dir_path: Union[str, None] = None
+) -> dict:
+  # Assets and images are processed once here; the image table is handed to every shard
+  # through the manifest. Their state is kept next to the manifest, like the shards'.
+  work_dir_path = os.path.dirname(manifest_path) or "."
+  if os.path.isdir(work_dir_path):
+    for file_name in os.listdir(work_dir_path):
+      if file_name.startswith("shard-"):
+        os.remove(os.path.join(work_dir_path, file_name))
+  images = None
+  if static_dir_path is not None:
+    sync_directory(static_dir_path, dest_dir_path, os.path.join(work_dir_path, "assets.json"))
+    images = process_images(
+      static_dir_path, dest_dir_path, os.path.join(work_dir_path, "images.json"),
+      os.path.join(work_dir_path, "images")
+    )
+  pages = sorted(walk_pages(content_dir_path, dest_dir_path))
+  sizes = {source: os.path.getsize(source) for source, _ in pages}
+  assignment = assign_shards(sizes, shards)
+  manifest = {
+    "version": WORK_MANIFEST_VERSION,
+    "content": content_dir_path,
+    "template": template_path,
+    "dest": dest_dir_path,
+    "static": static_dir_path,
+    "shards": shards,
+    "images": images,
+    "pages": [
+      {"source": source, "dest": dest, "size": sizes[source], "shard": assignment[source]}
+      for source, dest in pages
+    ],
+  }
+  write_state(manifest_path, manifest, indent=1)
+  loads = [0] * shards
+  for page in manifest["pages"]:
+    loads[page["shard"]] += page["size"]
+  logger.info(f"Planned {len(pages)} pages over {shards} shards, bytes per shard: {loads}")
+  return manifest
+
+
+def load_manifest(manifest_path: str) -> dict:
+  with open(manifest_path, "r") as f:
+    manifest = json.load(f)
+  if manifest.get("version") != WORK_MANIFEST_VERSION:
+    raise ValueError(f"{manifest_path}: unsupported work manifest version")
+  return manifest
+
+
+def shard_path(manifest_path: str, shard: int, suffix: str = ".json") -> str:
+  # Per-shard files live next to the manifest: the result, plus the search terms and links
+  # of its pages, which the merge combines
+  return os.path.join(os.path.dirname(manifest_path), f"shard-{shard}{suffix}")
+
+
+def build_shard(manifest_path: str, shard: int, jobs: int = 1) -> list[tuple[str, str]]:
+  manifest = load_manifest(manifest_path)
+  if not 0 <= shard < manifest["shards"]:
+    raise ValueError(f"Shard {shard} is outside 0..{manifest['shards'] - 1}")
+  pages = [(page["source"], page["dest"]) for page in manifest["pages"] if page["shard"] == shard]
+  errors = generate_pages_recursive(
+    manifest["content"],
+    manifest["template"],
+    manifest["dest"],
+    jobs=jobs,
+    static_dir_path=manifest["static"],
+    search_state_path=shard_path(manifest_path, shard, "-search.json"),
+    links_state_path=shard_path(manifest_path, shard, "-links.json"),
+    images=manifest["images"],
+    pages=pages
+  )
+  # The result file is written last; its presence tells the merge the shard finished
+  write_state(
+    shard_path(manifest_path, shard), {"shard": shard, "pages": len(pages), "errors": errors},
+    indent=1
+  )
+  return errors
+
+
+def merge_shards(
+  manifest_path: str, search_path: Union[str, None] = None, links_path: Union[str, None] = None
+) -> list[tuple[str, str]]:
+  manifest = load_manifest(manifest_path)
+  results = []
+  for shard in range(manifest["shards"]):
+    try:
+      with open(shard_path(manifest_path, shard), "r") as f:
+        results.append(json.load(f))
+    except FileNotFoundError:
+      raise ValueError(f"Shard {shard} has not finished") from None
+
+  errors = [tuple(error) for result in results for error in result["errors"]]
+  logger.info(f"Merged {len(results)} shards: {sum(r['pages'] for r in results)} pages")
+  if search_path is not None:
+    index = SearchIndex()
+    for shard in range(manifest["shards"]):
+      state_path = shard_path(manifest_path, shard, "-search.json")
+      index.pages.update(SearchIndex.load(state_path).pages)
+    size = index.write(search_path)
+    logger.info(f"Search index: {len(index.pages)} pages, {size} bytes")
+  if links_path is not None:
+    # Links across shards can only be checked once every shard's pages are known
+    link_graph = LinkGraph()
+    for shard in range(manifest["shards"]):
+      link_graph.pages.update(LinkGraph.load(shard_path(manifest_path, shard, "-links.json")).pages)
+    report_broken_links(link_graph, manifest["dest"])
+    link_graph.write(links_path)
+  return errors
+
+
+def run_local(manifest_path: str, shards: int, jobs: int = 1) -> list[int]:
+  # Stand-in for separate hosts: one independent process per shard
+  processes = [
+    subprocess.Popen([
+      sys.executable, os.path.abspath(__file__), "--manifest", manifest_path, "build",
+      str(shard), "--jobs", str(jobs)
+    ]) for shard in range(shards)
+  ]
+  return [process.wait() for process in processes]
+
+
+def main(argv=None):
+  from cli import add_path_arguments
+
+  parser = argparse.ArgumentParser(description="Build the site in shards over a work manifest")
+  add_path_arguments(parser)
+  parser.add_argument("--manifest", help="work manifest (default: <cache-dir>/work/manifest.json)")
+  parser.add_argument("--log-level", default="INFO")
+  commands = parser.add_subparsers(dest="command", required=True)
+  plan = commands.add_parser("plan", help="write the work manifest")
+  plan.add_argument("shards", type=int)
+  build = commands.add_parser("build", help="build one shard of the manifest")
+  build.add_argument("shard", type=int)
+  build.add_argument("--jobs", type=int, default=1)
+  commands.add_parser("merge", help="combine the results of every shard")
+  local = commands.add_parser("local", help="plan, build every shard as a process, merge")
+  local.add_argument("shards", type=int)
+  local.add_argument("--jobs", type=int, default=1)
+  args = parser.parse_args(argv)
+  logging.basicConfig(level=args.log_level.upper(), format="%(message)s")
+  if args.manifest is None:
+    args.manifest = os.path.join(args.cache_dir, "work", "manifest.json")
+
+  errors = []
+  if args.command in ("plan", "local"):
+    plan_build(args.content, args.template, args.dest, args.manifest, args.shards, args.static)
+  if args.command == "build":
+    errors = build_shard(args.manifest, args.shard, args.jobs)
+  if args.command == "local" and any(run_local(args.manifest, args.shards, args.jobs)):
+    sys.exit("A shard build failed")
+  if args.command in ("merge", "local"):
+    # The site is merged where the manifest says it was built
+    dest_dir_path = load_manifest(args.manifest)["dest"]
+    errors = merge_shards(
+      args.manifest,
+      os.path.join(dest_dir_path, "search.idx"),
+      os.path.join(dest_dir_path, "links.json")
+    )
+  if errors:
+    sys.exit(1)
+
+if __name__ == "__main__":
+  main()
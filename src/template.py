@@ -0,0 +1,63 @@
+import os
+import re
+import hashlib
+
+from io import StringIO
+from typing import TextIO, Union
+
+SLOT_PATTERN = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+
+_template_cache: dict[str, tuple[tuple[int, int], "Template"]] = {}
+
+
+class Template:
+  def __init__(self, source: str) -> None:
+    # Parsed once into alternating literal chunks and slot names:
+    # chunks[0] slots[0] chunks[1] slots[1] ... chunks[-1]
+    self.chunks = []
+    self.slots = []
+    self.digest = hashlib.sha256(source.encode("utf-8")).hexdigest()
+    position = 0
+    for match in SLOT_PATTERN.finditer(source):
+      self.chunks.append(source[position:match.start()])
+      self.slots.append(match.group(1))
+      position = match.end()
+    self.chunks.append(source[position:])
+
+  def __eq__(self, other: object) -> bool:
+    return self.chunks == other.chunks and self.slots == other.slots
+
+  def __repr__(self) -> str:
+    return f"Template(slots: {self.slots})"
+
+  def write(self, out: TextIO, values: dict[str, Union[str, object]]):
+    # Slot values are strings, nodes exposing write_html, or callables writing to `out`;
+    # missing slots render empty
+    out.write(self.chunks[0])
+    for slot, chunk in zip(self.slots, self.chunks[1:]):
+      value = values.get(slot, "")
+      if isinstance(value, str):
+        out.write(value)
+      elif callable(value):
+        value(out)
+      else:
+        value.write_html(out)
+      out.write(chunk)
+
+  def render(self, values: dict[str, Union[str, object]]) -> str:
+    out = StringIO()
+    self.write(out, values)
+    return out.getvalue()
+
+
+def load_template(template_path: str) -> Template:
+  stat = os.stat(template_path)
+  key = (stat.st_mtime_ns, stat.st_size)
+  cached = _template_cache.get(template_path)
+  if cached is not None and cached[0] == key:
+    return cached[1]
+
+  with open(template_path, "r", encoding="utf-8") as f:
+    template = Template(f.read())
+  _template_cache[template_path] = (key, template)
+  return template
@@ -0,0 +1,67 @@
+import os
+import unittest
+
+from assets import copy_file, is_unchanged, sync_directory
+from testutil import TempDirTestCase
+
+
+class TestAssetSync(TempDirTestCase):
+  def setUp(self):
+    super().setUp()
+    self.static = os.path.join(self.root, "static")
+    self.public = os.path.join(self.root, "public")
+    self.state = os.path.join(self.root, ".cache", "assets.json")
+    os.makedirs(os.path.join(self.static, "images"))
+    self.write(os.path.join(self.static, "index.css"), "body {}")
+    self.write(os.path.join(self.static, "images", "a.png"), "png bytes")
+
+  def test_sync_copies_only_changes(self):
+    self.assertEqual(
+      sync_directory(self.static, self.public, self.state), {
+        "copied": 2, "skipped": 0, "removed": 0
+      }
+    )
+    self.assertEqual(self.read(os.path.join(self.public, "index.css")), "body {}")
+    self.assertEqual(
+      sync_directory(self.static, self.public, self.state), {
+        "copied": 0, "skipped": 2, "removed": 0
+      }
+    )
+
+    self.write(os.path.join(self.static, "index.css"), "body { margin: 0; }")
+    self.assertEqual(
+      sync_directory(self.static, self.public, self.state), {
+        "copied": 1, "skipped": 1, "removed": 0
+      }
+    )
+    self.assertEqual(self.read(os.path.join(self.public, "index.css")), "body { margin: 0; }")
+
+  def test_sync_removes_only_orphans(self):
+    sync_directory(self.static, self.public, self.state)
+    self.write(os.path.join(self.public, "index.html"), "<html></html>")
+    os.remove(os.path.join(self.static, "images", "a.png"))
+
+    stats = sync_directory(self.static, self.public, self.state)
+    self.assertEqual(stats["removed"], 1)
+    self.assertFalse(os.path.exists(os.path.join(self.public, "images")))
+    self.assertTrue(os.path.exists(os.path.join(self.public, "index.html")))
+
+  def test_checksum(self):
+    src = os.path.join(self.static, "index.css")
+    dest = os.path.join(self.public, "index.css")
+    self.write(dest, "body {}")
+    self.assertFalse(is_unchanged(src, dest))
+    self.assertTrue(is_unchanged(src, dest, checksum=True))
+    self.write(dest, "body {!")
+    self.assertFalse(is_unchanged(src, dest, checksum=True))
+
+  def test_hardlink(self):
+    src = os.path.join(self.static, "index.css")
+    dest = os.path.join(self.root, "linked.css")
+    copy_file(src, dest, link=True)
+    self.assertEqual(self.read(dest), "body {}")
+    self.assertTrue(is_unchanged(src, dest))
+
+
+if __name__ == "__main__":
+  unittest.main()
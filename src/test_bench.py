@@ -0,0 +1,52 @@
+import unittest
+
+from bench import (
+  generate_corpus, parse_block_mix, run_benchmarks, run_escape_benchmarks, run_node_benchmarks,
+  unescaped_copy
+)
+from process import block_to_block_type, extract_title, markdown_to_blocks, markdown_to_html_node
+
+
+class TestBench(unittest.TestCase):
+  def test_corpus_is_deterministic(self):
+    self.assertListEqual(generate_corpus(3, seed=1), generate_corpus(3, seed=1))
+    self.assertNotEqual(generate_corpus(3, seed=1), generate_corpus(3, seed=2))
+
+  def test_corpus_parses(self):
+    mix = {"paragraph": 1, "heading": 1, "ordered_list": 1, "unordered_list": 1, "quote": 1, "code": 1}
+    for markdown in generate_corpus(5, blocks=30, block_mix=mix, inline_density=0.5):
+      self.assertTrue(extract_title(markdown))
+      block_types = {block_to_block_type(block) for block in markdown_to_blocks(markdown)}
+      self.assertSetEqual(block_types, set(mix))
+      markdown_to_html_node(markdown).to_html()
+
+  def test_run_benchmarks(self):
+    results = run_benchmarks(generate_corpus(2, blocks=5), repeat=1)
+    self.assertListEqual(
+      list(results), [
+        "markdown_to_blocks", "block_to_block_type", "text_to_textnodes", "markdown_to_html_node",
+        "to_html", "template", "file_io"
+      ]
+    )
+    self.assertGreaterEqual(results["to_html"]["best"], 0)
+
+  def test_node_benchmarks(self):
+    results = run_node_benchmarks(2000, repeat=1)
+    self.assertListEqual(list(results), ["TextNode", "LeafNode", "ParentNode"])
+    for kinds in results.values():
+      self.assertLess(kinds["slots"]["bytes_per_node"], kinds["dict"]["bytes_per_node"])
+
+  def test_escape_benchmarks(self):
+    corpus = generate_corpus(2, blocks=5)
+    for markdown in corpus:
+      node = markdown_to_html_node(markdown)
+      self.assertEqual(unescaped_copy(node).to_html(), node.to_html())
+    results = run_escape_benchmarks(corpus, repeat=1)
+    self.assertListEqual(list(results), ["escaped", "unescaped", "overhead"])
+
+  def test_parse_block_mix(self):
+    self.assertDictEqual(parse_block_mix("paragraph=6, code=1"), {"paragraph": 6.0, "code": 1.0})
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,81 @@
+import os
+import unittest
+
+from cache import BlockCache
+from main import generate_pages_recursive
+from process import markdown_to_html_node
+from testutil import TempDirTestCase
+
+MARKDOWN = "# Title\n\nSome **bold** text\n\n- a\n- b\n\n> quoted\n\n```\ncode\n```"
+
+
+class TestBlockCache(TempDirTestCase):
+  def setUp(self):
+    super().setUp()
+    self.path = os.path.join(self.root, "blocks.sqlite")
+
+  def test_persists_across_runs(self):
+    with BlockCache(self.path, version="1") as cache:
+      self.assertIsNone(cache.get("block"))
+      cache.put("block", "<p>block</p>")
+      self.assertEqual(cache.get("block"), "<p>block</p>")
+    with BlockCache(self.path, version="1") as cache:
+      self.assertEqual(cache.get("block"), "<p>block</p>")
+      self.assertEqual(cache.stats(), {"hits": 1, "misses": 0, "entries": 1, "bytes": 12})
+
+  def test_version_change_invalidates(self):
+    with BlockCache(self.path, version="1") as cache:
+      cache.put("block", "<p>block</p>")
+    with BlockCache(self.path, version="2") as cache:
+      self.assertIsNone(cache.get("block"))
+      self.assertEqual(cache.stats()["entries"], 0)
+
+  def test_lru_eviction(self):
+    with BlockCache(self.path, max_bytes=25, version="1") as cache:
+      cache.put("old", "x" * 10)
+      cache.flush()
+      cache.put("newer", "y" * 10)
+      cache.flush()
+      cache.get("old")
+      cache.flush()
+      cache.put("newest", "z" * 10)
+      cache.flush()
+      self.assertEqual(cache.get("old"), "x" * 10)
+      self.assertIsNone(cache.get("newer"))
+      self.assertEqual(cache.get("newest"), "z" * 10)
+
+  def test_cached_html_matches(self):
+    expected = markdown_to_html_node(MARKDOWN).to_html()
+    with BlockCache(self.path) as cache:
+      self.assertEqual(markdown_to_html_node(MARKDOWN, cache=cache).to_html(), expected)
+      # The heading is never cached; its id depends on the headings before it
+      self.assertEqual(cache.misses, 4)
+      self.assertEqual(markdown_to_html_node(MARKDOWN, cache=cache).to_html(), expected)
+      self.assertEqual(cache.hits, 4)
+
+  def test_build_with_cache(self):
+    content = os.path.join(self.root, "content")
+    template = os.path.join(self.root, "template.html")
+    os.makedirs(content)
+    with open(template, "w") as f:
+      f.write("{{ Content }}")
+    for i in range(4):
+      with open(os.path.join(content, f"{i}.md"), "w") as f:
+        f.write(f"# Page {i}\n\nShared footer")
+
+    generate_pages_recursive(content, template, os.path.join(self.root, "plain"))
+    for jobs in [1, 2]:
+      public = os.path.join(self.root, f"public{jobs}")
+      generate_pages_recursive(
+        content, template, public, jobs=jobs, cache_path=self.path, batch_bytes=1
+      )
+      for name in os.listdir(public):
+        with open(os.path.join(public, name)) as cached, \
+             open(os.path.join(self.root, "plain", name)) as plain:
+          self.assertEqual(cached.read(), plain.read())
+    with BlockCache(self.path) as cache:
+      self.assertEqual(cache.stats()["entries"], 1)
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,92 @@
+import os
+import sys
+import unittest
+import subprocess
+from unittest import mock
+
+import cli
+from bench import LAZY_MODULES, STARTUP_TARGET, run_startup_benchmarks
+from testutil import TempDirTestCase
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class TestCli(TempDirTestCase):
+  def setUp(self):
+    super().setUp()
+    self.content = os.path.join(self.root, "pages")
+    self.static = os.path.join(self.root, "assets")
+    self.public = os.path.join(self.root, "site")
+    self.cache = os.path.join(self.root, "state")
+    self.template = os.path.join(self.root, "layout.html")
+    os.makedirs(self.content)
+    os.makedirs(self.static)
+    self.write(self.template, "<title>{{ Title }}</title>{{ Content }}")
+    self.write(os.path.join(self.content, "index.md"), "# Home\n\nWelcome " + "home " * 100)
+    self.write(os.path.join(self.static, "index.css"), "body {}")
+
+  def paths(self):
+    return ["--content", self.content, "--static", self.static, "--dest", self.public,
+            "--cache-dir", self.cache]
+
+  def test_build_and_clean_with_paths(self):
+    with self.assertLogs("main", level="INFO"):
+      cli.main(["build", *self.paths(), "--template", self.template, "--jobs", "1", "--gzip"])
+    for name in ("index.html", "index.html.gz", "index.css", "search.idx", "links.json"):
+      self.assertTrue(os.path.exists(os.path.join(self.public, name)), name)
+    self.assertTrue(os.path.exists(os.path.join(self.cache, "manifest.json")))
+
+    cli.main(["clean", *self.paths(), "--keep-cache"])
+    self.assertFalse(os.path.exists(self.public))
+    self.assertTrue(os.path.exists(self.cache))
+    cli.main(["clean", *self.paths()])
+    self.assertFalse(os.path.exists(self.cache))
+
+  def test_linked_assets(self):
+    cli.main(["build", *self.paths(), "--template", self.template, "--jobs", "1", "--link",
+              "--checksum"])
+    css = os.path.join(self.static, "index.css")
+    self.assertTrue(os.path.samefile(css, os.path.join(self.public, "index.css")))
+
+  def test_no_search_index(self):
+    build = ["build", *self.paths(), "--template", self.template, "--jobs", "1"]
+    cli.main(build)
+    self.assertTrue(os.path.exists(os.path.join(self.public, "search.idx")))
+    self.write(os.path.join(self.content, "index.md"), "# Home\n\nEdited")
+    with mock.patch("main.page_postings") as postings:
+      cli.main(build + ["--no-search-index"])
+    postings.assert_not_called()
+    self.assertFalse(os.path.exists(os.path.join(self.public, "search.idx")))
+    self.assertFalse(os.path.exists(os.path.join(self.cache, "search.json")))
+
+  def test_failed_build_exits(self):
+    self.write(os.path.join(self.content, "index.md"), "no title")
+    with self.assertRaises(SystemExit) as exit, self.assertLogs("main", level="ERROR"):
+      cli.main(["build", *self.paths(), "--template", self.template, "--jobs", "1"])
+    self.assertEqual(exit.exception.code, "1 page(s) failed to build")
+
+  def test_arguments(self):
+    with mock.patch("bench.main") as bench_main:
+      cli.main(["bench", "--pages", "3", "--repeat", "1"])
+    bench_main.assert_called_once_with(["--pages", "3", "--repeat", "1"])
+    with self.assertRaises(SystemExit), mock.patch("sys.stderr"):
+      cli.main(["build", "--pages", "3"])
+    with self.assertRaises(SystemExit), mock.patch("sys.stderr"):
+      cli.main([])
+
+
+class TestStartup(unittest.TestCase):
+  def test_heavy_modules_are_imported_lazily(self):
+    loaded = subprocess.run(
+      [sys.executable, "-c", "import sys, cli, main; print(' '.join(sys.modules))"],
+      env=dict(os.environ, PYTHONPATH=SRC_DIR), capture_output=True, text=True, check=True
+    ).stdout.split()
+    self.assertListEqual([name for name in LAZY_MODULES if name in loaded], [])
+
+  def test_startup_target(self):
+    results = run_startup_benchmarks(repeat=5)
+    self.assertLess(results["overhead"], STARTUP_TARGET, results)
+
+
+if __name__ == "__main__":
+  unittest.main()
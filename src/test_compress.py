@@ -0,0 +1,60 @@
+import os
+import gzip
+import unittest
+
+from compress import precompress
+from testutil import TempDirTestCase
+
+
+class TestPrecompress(TempDirTestCase):
+  def setUp(self):
+    super().setUp()
+    self.public = os.path.join(self.root, "public")
+    self.state = os.path.join(self.root, ".cache", "gzip.json")
+    os.makedirs(os.path.join(self.public, "post"))
+    self.page = os.path.join(self.public, "post", "index.html")
+    self.write(self.page, b"<p>hello</p>" * 100)
+    self.write(os.path.join(self.public, "index.css"), b"body { color: red; }\n" * 50)
+    self.write(os.path.join(self.public, "tiny.css"), b"a {}")
+    self.write(os.path.join(self.public, "image.png"), bytes(1000))
+    self.write(os.path.join(self.public, "noise.txt"), os.urandom(1000))
+
+  def precompress(self):
+    return precompress(self.public, self.state, jobs=2)
+
+  def test_siblings(self):
+    self.assertDictEqual(self.precompress(), {"compressed": 2, "skipped": 1, "removed": 0})
+    with gzip.open(self.page + ".gz") as f:
+      self.assertEqual(f.read(), b"<p>hello</p>" * 100)
+    for name in ("tiny.css", "image.png", "noise.txt"):
+      self.assertFalse(os.path.exists(os.path.join(self.public, name + ".gz")))
+
+    self.assertDictEqual(self.precompress(), {"compressed": 0, "skipped": 3, "removed": 0})
+
+  def test_only_changed_sources_are_recompressed(self):
+    self.precompress()
+    os.utime(self.page + ".gz", (0, 0))
+    # Rewritten with the same bytes: hashed again but not recompressed
+    self.write(self.page, b"<p>hello</p>" * 100)
+    self.assertDictEqual(self.precompress(), {"compressed": 0, "skipped": 3, "removed": 0})
+    self.assertEqual(os.stat(self.page + ".gz").st_mtime, 0)
+
+    self.write(self.page, b"<p>changed</p>" * 100)
+    self.assertDictEqual(self.precompress(), {"compressed": 1, "skipped": 2, "removed": 0})
+    with gzip.open(self.page + ".gz") as f:
+      self.assertEqual(f.read(), b"<p>changed</p>" * 100)
+
+    os.remove(self.page + ".gz")
+    self.assertEqual(self.precompress()["compressed"], 1)
+
+  def test_removed_sources(self):
+    self.precompress()
+    os.remove(self.page)
+    self.write(os.path.join(self.public, "index.css"), b"a {}")
+    self.assertDictEqual(self.precompress(), {"compressed": 0, "skipped": 1, "removed": 2})
+    self.assertFalse(os.path.exists(os.path.join(self.public, "post")))
+    self.assertFalse(os.path.exists(os.path.join(self.public, "index.css.gz")))
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -1,6 +1,19 @@
 import unittest
 
-from process import text_node_to_html_node, TextNode, TextType, LeafNode, text_to_textnodes, markdown_to_blocks, block_to_block_type, markdown_to_html_node
+from io import StringIO
+
+from process import text_node_to_html_node, TextNode, TextType, LeafNode, text_to_textnodes, markdown_to_blocks, block_to_block_type, markdown_to_html_node, classify_block, iter_blocks, write_markdown_html, extract_title, parse_document, render_documents, scan_document
+
+
+class DictCache:
+  def __init__(self) -> None:
+    self.blocks = {}
+
+  def get(self, block):
+    return self.blocks.get(block)
+
+  def put(self, block, html):
+    self.blocks[block] = html
 
 
 class TestNodeConversion(unittest.TestCase):
@@ -118,7 +131,8 @@ this is paragraph text
     html = node.to_html()
     self.assertEqual(
       html,
-      "<div><h1>this is an h1</h1><p>this is paragraph text</p><h2>this is an h2</h2></div>",
+      '<div><h1 id="this-is-an-h1">this is an h1</h1><p>this is paragraph text</p>'
+      '<h2 id="this-is-an-h2">this is an h2</h2></div>',
     )
 
   def test_blockquote(self):
@@ -137,6 +151,103 @@ this is paragraph text
       "<div><blockquote>This is a blockquote block</blockquote><p>this is paragraph text</p></div>",
     )
 
+  def test_classify_block(self):
+    self.assertEqual(classify_block("## a heading"), ("heading", ["## a heading"]))
+    self.assertEqual(classify_block("#hashtag"), ("paragraph", ["#hashtag"]))
+    self.assertEqual(classify_block("- a\n- b"), ("unordered_list", ["- a", "- b"]))
+    self.assertEqual(classify_block("1. a\n3. b"), ("paragraph", ["1. a", "3. b"]))
+    self.assertEqual(classify_block("> a\nb"), ("paragraph", ["> a", "b"]))
+    self.assertEqual(classify_block("```\ncode\n```")[0], "code")
+
+  def test_heading_with_hash(self):
+    html = markdown_to_html_node("## Why C# matters").to_html()
+    self.assertEqual(html, '<div><h2 id="why-c-matters">Why C# matters</h2></div>')
+
+  def test_long_ordered_list(self):
+    md = "\n".join(f"{i}. item {i}" for i in range(1, 12))
+    html = markdown_to_html_node(md).to_html()
+    self.assertIn("<li>item 9</li><li>item 10</li><li>item 11</li>", html)
+
+  def test_iter_blocks_matches_markdown_to_blocks(self):
+    texts = [
+      "# a\n\npara\ntext\n\n\n- x\n- y\n",
+      "\n\n\nstart\n\n\n\nend",
+      "one\n \nstill one\n\n  two  ",
+      "",
+      "\n",
+      "no trailing newline",
+    ]
+    for text in texts:
+      self.assertListEqual(list(iter_blocks(StringIO(text))), markdown_to_blocks(text), repr(text))
+
+  def test_write_markdown_html(self):
+    md = "# Title\n\nSome **bold** text\n\n> a quote\n> continued\n\n1. one\n2. two\n"
+    out = StringIO()
+    write_markdown_html(StringIO(md), out)
+    self.assertEqual(out.getvalue(), markdown_to_html_node(md).to_html())
+    self.assertEqual(extract_title(md), "Title")
+
+    with self.assertRaises(ValueError):
+      write_markdown_html(StringIO("\n\n"), StringIO())
+
+  def test_code_block_is_escaped(self):
+    md = "```\nif (a < b && b > c) {}\n```"
+    self.assertEqual(
+      markdown_to_html_node(md).to_html(),
+      "<div><pre><code>if (a &lt; b &amp;&amp; b &gt; c) {}\n</code></pre></div>"
+    )
+
+  def test_parse_document(self):
+    md = "Intro\n\n```\n# not a title\n```\n\n## Sub\n\n# Real *title* \n\n###### Deep #6\n\ntext"
+    document = parse_document(md)
+    self.assertEqual(document.node, markdown_to_html_node(md))
+    self.assertEqual(document.title, "Real *title*")
+    self.assertListEqual(
+      document.headings, [(2, "Sub", "sub"), (1, "Real *title*", "real-title"), (6, "Deep #6", "deep-6")]
+    )
+    scanned = scan_document(StringIO(md))
+    self.assertListEqual(scanned.headings, document.headings)
+    self.assertEqual(scanned.title, document.title)
+
+    md = "```\n# not a title\n```\n\n# Title\nSubtitle\n\n## Sub"
+    self.assertEqual(parse_document(md).title, "Title")
+    self.assertEqual(scan_document(StringIO(md)).title, "Title")
+
+    document = parse_document("## only a subheading")
+    self.assertIsNone(document.title)
+    with self.assertRaises(ValueError):
+      document.require_title()
+
+  def test_parse_document_with_cache(self):
+    md = "# Title\n\npara\n\n## Sub"
+    cache = DictCache()
+    for _ in range(2):
+      document = parse_document(md, cache=cache)
+      self.assertEqual(document.node.to_html(), markdown_to_html_node(md).to_html())
+      self.assertEqual(document.title, "Title")
+      self.assertListEqual(document.headings, [(1, "Title", "title"), (2, "Sub", "sub")])
+    # Headings are rendered on every parse since their ids depend on earlier headings
+    self.assertListEqual(list(cache.blocks), ["para"])
+
+  def test_render_documents(self):
+    documents = [(i, f"# Page {i}\n\nBody with `code` {i}") for i in range(20)]
+    expected = [
+      (i, extract_title(md), markdown_to_html_node(md).to_html(), None) for i, md in documents
+    ]
+    self.assertListEqual(list(render_documents(iter(documents))), expected)
+    self.assertListEqual(list(render_documents(documents, jobs=2, chunksize=3)), expected)
+
+  def test_render_documents_reports_errors(self):
+    # A document without an H1 fails on its own; the rest of the batch is still rendered
+    documents = [(0, "# One\n\nBody"), (1, "No title"), (2, "# Two\n\nBody")]
+    for jobs in (1, 2):
+      results = list(render_documents(documents, jobs=jobs, chunksize=1))
+      self.assertListEqual([result[0] for result in results], [0, 1, 2])
+      self.assertEqual(results[1][:3], (1, None, None))
+      self.assertTrue(results[1][3].startswith("ValueError: No H1 header found"))
+      self.assertListEqual([result[1] for result in results], ["One", None, "Two"])
+      self.assertIsNone(results[2][3])
+
 
 if __name__ == "__main__":
   unittest.main()
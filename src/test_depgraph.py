@@ -0,0 +1,83 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import main
+from depgraph import DependencyGraph
+from main import generate_pages_recursive
+from testutil import TempDirTestCase
+
+
+class TestDependencyGraph(unittest.TestCase):
+  def test_dependents(self):
+    graph = DependencyGraph()
+    graph.set_page("content/a.md", "public/a.html", ["content/a.md", "template.html", "./static/x.png"])
+    graph.set_page("content/b.md", "public/b.html", ["content/b.md", "template.html"])
+    self.assertListEqual(graph.dependents("static/x.png"), ["content/a.md"])
+    self.assertListEqual(graph.dependents("./template.html"), ["content/a.md", "content/b.md"])
+    self.assertListEqual(graph.dependencies("./content/b.md"), ["content/b.md", "template.html"])
+
+    graph.remove_page("content/a.md")
+    self.assertListEqual(graph.dependents("static/x.png"), [])
+
+  def test_save_and_load(self):
+    graph = DependencyGraph()
+    graph.set_page("a.md", "a.html", ["a.md", "t.html", "x.png"])
+    graph.inputs = {"a.md": "hash", "t.html": "digest", "x.png": None, "gone.png": "1:2"}
+    graph.prune_inputs()
+    with tempfile.TemporaryDirectory() as root:
+      path = os.path.join(root, "manifest.json")
+      graph.save(path)
+      loaded = DependencyGraph.load(path)
+    self.assertDictEqual(loaded.pages, graph.pages)
+    self.assertDictEqual(loaded.inputs, {"a.md": "hash", "t.html": "digest", "x.png": None})
+    self.assertDictEqual(DependencyGraph.load(path).pages, {})
+
+
+class TestDependencyRebuilds(TempDirTestCase):
+  def setUp(self):
+    super().setUp()
+    self.content = os.path.join(self.root, "content")
+    self.static = os.path.join(self.root, "static")
+    self.public = os.path.join(self.root, "public")
+    self.template = os.path.join(self.root, "template.html")
+    self.manifest = os.path.join(self.root, "manifest.json")
+    os.makedirs(self.content)
+    os.makedirs(os.path.join(self.static, "images"))
+    self.write(self.template, "{{ Content }}")
+    self.write(os.path.join(self.content, "a.md"), "# A\n\n![elves](/images/rivendell.png)")
+    self.write(os.path.join(self.content, "b.md"), "# B\n\nNo images")
+
+  def build(self):
+    with mock.patch("main.parse_document", wraps=main.parse_document) as parse:
+      generate_pages_recursive(
+        self.content,
+        self.template,
+        self.public,
+        incremental=True,
+        manifest_path=self.manifest,
+        static_dir_path=self.static
+      )
+    return sorted(call.args[0].split("\n")[0] for call in parse.call_args_list)
+
+  def test_image_change_rebuilds_dependents(self):
+    with self.assertLogs("main", "WARNING"):
+      self.assertListEqual(self.build(), ["# A", "# B"])
+    self.assertListEqual(self.build(), [])
+
+    image = os.path.join(self.static, "images", "rivendell.png")
+    self.write(image, "png")
+    self.assertListEqual(self.build(), ["# A"])
+    self.assertListEqual(self.build(), [])
+
+    graph = DependencyGraph.load(self.manifest)
+    self.assertListEqual(graph.dependents(image), [os.path.normpath(os.path.join(self.content, "a.md"))])
+
+    os.remove(image)
+    with self.assertLogs("main", "WARNING"):
+      self.assertListEqual(self.build(), ["# A"])
+
+
+if __name__ == "__main__":
+  unittest.main()
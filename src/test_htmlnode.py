@@ -1,6 +1,10 @@
 import unittest
 
-from htmlnode import HTMLNode, LeafNode, ParentNode
+import pickle
+
+from io import StringIO
+
+from htmlnode import HTMLNode, LeafNode, ParentNode, escape_attribute, escape_text
 
 
 class TestHTMLNode(unittest.TestCase):
@@ -30,6 +34,18 @@ class TestHTMLNode(unittest.TestCase):
       node = LeafNode(None, tag="a").to_html()
 
 
+  def test_escaping(self):
+    node = LeafNode(tag="code", value="if a < b && c > d:")
+    self.assertEqual(node.to_html(), "<code>if a &lt; b &amp;&amp; c &gt; d:</code>")
+    self.assertEqual(LeafNode("Tom & \"Jerry\"").to_html(), "Tom &amp; \"Jerry\"")
+
+    node = LeafNode(tag="a", value="q", props={"href": "/s?a=1&b=\"2\"", "title": "it's"})
+    self.assertEqual(node.to_html(), '<a href="/s?a=1&amp;b=&quot;2&quot;" title="it&#x27;s">q</a>')
+
+    clean = "nothing to escape here"
+    self.assertIs(escape_text(clean), clean)
+    self.assertIs(escape_attribute(clean), clean)
+
   def test_parent_html(self):
     node = ParentNode(
       "p",
@@ -59,5 +75,33 @@ class TestHTMLNode(unittest.TestCase):
     with self.assertRaises(ValueError):
       node = ParentNode("a", []).to_html()
 
+  def test_write_html(self):
+    node = ParentNode(
+      "div",
+      [
+        ParentNode("p", [LeafNode("some plain text"), LeafNode(tag="b", value="Bold text")]),
+        LeafNode(tag="a", value="Click me!", props={"href": "https://www.google.com"}),
+      ],
+    )
+    out = StringIO()
+    node.write_html(out)
+    self.assertEqual(out.getvalue(), node.to_html())
+    self.assertEqual(
+      out.getvalue(),
+      '<div><p>some plain text<b>Bold text</b></p><a href="https://www.google.com">Click me!</a></div>'
+    )
+
+    with self.assertRaises(NotImplementedError):
+      HTMLNode(tag="p").write_html(StringIO())
+
+  def test_slots(self):
+    node = ParentNode("p", [LeafNode(tag="b", value="Bold text")], {"class": "x"})
+    self.assertFalse(hasattr(node, "__dict__"))
+    self.assertFalse(hasattr(node.children[0], "__dict__"))
+    copy = pickle.loads(pickle.dumps(node))
+    self.assertEqual(copy, node)
+    self.assertEqual(repr(copy.children[0]), "LeafNode(b, Bold text, None)")
+
+
 if __name__ == "__main__":
   unittest.main()
@@ -0,0 +1,122 @@
+import os
+import json
+import struct
+import unittest
+
+from images import image_size, process_images
+from process import markdown_to_html_node, parse_document
+from testutil import TempDirTestCase, png_header
+
+
+def jpeg_bytes(width, height):
+  app0 = b"\xff\xe0" + struct.pack(">H", 16) + b"JFIF\x00" + bytes(9)
+  sof = b"\xff\xc2" + struct.pack(">HBHH", 11, 8, height, width) + bytes(6)
+  return b"\xff\xd8" + app0 + sof + b"\xff\xd9"
+
+
+class TestImageSize(TempDirTestCase):
+  def size_of(self, data):
+    path = os.path.join(self.root, "image")
+    with open(path, "wb") as f:
+      f.write(data)
+    return image_size(path)
+
+  def test_formats(self):
+    self.assertEqual(self.size_of(png_header(1344, 896) + bytes(20)), (1344, 896))
+    self.assertEqual(self.size_of(b"GIF89a" + struct.pack("<HH", 40, 30) + bytes(20)), (40, 30))
+    self.assertEqual(self.size_of(jpeg_bytes(800, 600)), (800, 600))
+    vp8x = b"RIFF" + bytes(4) + b"WEBPVP8X" + bytes(8) + (639).to_bytes(3, "little")
+    self.assertEqual(self.size_of(vp8x + (479).to_bytes(3, "little")), (640, 480))
+    bits = 99 | 49 << 14
+    vp8l = b"RIFF" + bytes(4) + b"WEBPVP8L" + bytes(5) + bits.to_bytes(4, "little")
+    self.assertEqual(self.size_of(vp8l + bytes(5)), (100, 50))
+
+  def test_unknown_or_truncated(self):
+    self.assertIsNone(self.size_of(b"not an image at all, just text"))
+    self.assertIsNone(self.size_of(jpeg_bytes(800, 600)[:24]))
+
+
+class TestProcessImages(TempDirTestCase):
+  def setUp(self):
+    super().setUp()
+    self.static = os.path.join(self.root, "static")
+    self.public = os.path.join(self.root, "public")
+    self.state = os.path.join(self.root, ".cache", "images.json")
+    self.cache = os.path.join(self.root, ".cache", "images")
+    os.makedirs(os.path.join(self.static, "images"))
+    self.write(os.path.join(self.static, "images", "wide.png"), png_header(1000, 500))
+    self.write(os.path.join(self.static, "images", "small.png"), png_header(100, 50))
+    self.write(os.path.join(self.static, "index.css"), b"body {}")
+    self.resized = []
+
+  def resize(self, src_path, dest_path, width):
+    self.resized.append((os.path.basename(src_path), width))
+    self.write(dest_path, f"{width}px".encode())
+
+  def process(self, resize=None):
+    return process_images(
+      self.static, self.public, self.state, self.cache, widths=(200, 400, 2000),
+      resize=resize or self.resize
+    )
+
+  def test_derivatives_are_cached_by_content(self):
+    images = self.process()
+    self.assertDictEqual(
+      images["/images/wide.png"], {
+        "width": 1000,
+        "height": 500,
+        "derivatives": [("/images/wide-200w.png", 200), ("/images/wide-400w.png", 400)],
+      }
+    )
+    self.assertEqual(images["/images/small.png"]["derivatives"], [])
+    self.assertNotIn("/index.css", images)
+    with open(os.path.join(self.public, "images", "wide-400w.png"), "rb") as f:
+      self.assertEqual(f.read(), b"400px")
+    self.assertListEqual(self.resized, [("wide.png", 200), ("wide.png", 400)])
+
+    self.assertEqual(self.process(), images)
+    self.assertEqual(len(self.resized), 2)
+
+    # Same bytes under a new name reuse the cached derivatives
+    os.rename(
+      os.path.join(self.static, "images", "wide.png"), os.path.join(self.static, "images", "w.png")
+    )
+    images = self.process()
+    self.assertEqual(len(self.resized), 2)
+    self.assertIn("/images/w-400w.png", dict(images["/images/w.png"]["derivatives"]))
+    self.assertFalse(os.path.exists(os.path.join(self.public, "images", "wide-400w.png")))
+
+  def test_sizes_without_resizer(self):
+    images = process_images(self.static, self.public, self.state, self.cache, resize=None)
+    self.assertEqual(images["/images/wide.png"]["width"], 1000)
+    with open(self.state) as f:
+      self.assertIn("images/wide.png", json.load(f)["images"])
+
+  def test_img_attributes(self):
+    images = self.process()
+    md = "# T\n\n![a wide one](/images/wide.png)\n\n![remote](https://x.org/a.png)"
+    html = markdown_to_html_node(md, images=images).to_html()
+    self.assertIn(
+      '<img src="/images/wide-400w.png" alt="a wide one" width="1000" height="500" '
+      'srcset="/images/wide-200w.png 200w, /images/wide-400w.png 400w, /images/wide.png 1000w">',
+      html
+    )
+    self.assertIn('<img src="https://x.org/a.png" alt="remote">', html)
+
+  def test_image_blocks_bypass_block_cache(self):
+    cache = {}
+
+    class Cache:
+      def get(self, block):
+        return cache.get(block)
+
+      def put(self, block, html):
+        cache[block] = html
+
+    md = "# T\n\n![a](/images/small.png)\n\ntext"
+    parse_document(md, cache=Cache(), images=self.process()).node.to_html()
+    self.assertListEqual(list(cache), ["text"])
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -2,10 +2,17 @@ import unittest
 from process import (
   markdown_to_blocks, split_nodes_delimiter, TextNode, TextType, extract_markdown_links,
   extract_markdown_images, split_nodes_link, split_nodes_image, text_to_textnodes,
-  block_to_block_type
+  block_to_block_type, TEXT_DELIMITERS
 )
 
 
+def chained_text_to_textnodes(text):
+  nodes = [TextNode(text, TextType.NORMAL)]
+  for delimiter, text_type in TEXT_DELIMITERS:
+    nodes = split_nodes_delimiter(nodes, delimiter, text_type)
+  return split_nodes_link(split_nodes_image(nodes))
+
+
 class TestInlineMarkdown(unittest.TestCase):
   def test_delim_bold(self):
     node = TextNode("This is text with a **bolded** word", TextType.NORMAL)
@@ -130,6 +137,53 @@ class TestInlineMarkdown(unittest.TestCase):
       ]
     )
 
+  def test_leading_image(self):
+    node = TextNode("![obi wan](https://i.imgur.com/fJRm4Vk.jpeg) at the start", TextType.NORMAL)
+    self.assertListEqual(
+      split_nodes_image([node]), [
+        TextNode("obi wan", TextType.IMAGE, "https://i.imgur.com/fJRm4Vk.jpeg"),
+        TextNode(" at the start", TextType.NORMAL),
+      ]
+    )
+
+  def test_single_pass_matches_chained(self):
+    texts = [
+      "This is text with a **bolded** word",
+      "This is text with a **bolded** word and **another**",
+      "This is text with a **bolded word** and **another**",
+      "This is text with an *italic* word",
+      "**bold** and *italic*",
+      "This is text with a `code block` word",
+      "This is text with a ![rick roll](https://i.imgur.com/aKaOqIh.gif) and ![obi wan](https://i.imgur.com/fJRm4Vk.jpeg)",
+      "This is text with a link [to google](https://www.google.com), [to youtube](https://www.youtube.com) and [to twitter](https://www.x.com)",
+      "This is **text** with an *italic* word and a `code block` and an ![obi wan image](https://i.imgur.com/fJRm4Vk.jpeg) and a [link](https://boot.dev)",
+      "![LOTR image artistmonkeys](/images/rivendell.png)",
+      "Wow! [Back Home](/) and a**** gap and `` here",
+      "",
+    ]
+    for text in texts:
+      self.assertListEqual(text_to_textnodes(text), chained_text_to_textnodes(text), text)
+
+  def test_single_pass_precedence(self):
+    self.assertListEqual(text_to_textnodes("[*a*](u)"), [TextNode("*a*", TextType.LINK, "u")])
+    self.assertListEqual(
+      text_to_textnodes("![`c`](p) x"),
+      [TextNode("`c`", TextType.IMAGE, "p"), TextNode(" x", TextType.NORMAL)]
+    )
+    self.assertListEqual(text_to_textnodes("`a*b`"), [TextNode("a*b", TextType.CODE)])
+    self.assertListEqual(
+      text_to_textnodes("*a [b*](u)"),
+      [TextNode("a [b", TextType.ITALIC), TextNode("](u)", TextType.NORMAL)]
+    )
+    # The * inside the link does not pair with the one after it
+    with self.assertRaises(Exception):
+      text_to_textnodes("[*](u)*")
+
+  def test_single_pass_unmatched(self):
+    for text in ["a **bold", "an *italic", "some `code"]:
+      with self.assertRaises(Exception):
+        text_to_textnodes(text)
+
 
 if __name__ == "__main__":
   unittest.main()
@@ -0,0 +1,150 @@
+import os
+import json
+import unittest
+from unittest import mock
+
+import main
+from main import generate_pages_recursive
+from links import LinkGraph, resolve_link
+from process import parse_document, toc_node
+from testutil import TempDirTestCase, read_tree
+
+
+class TestLinkCollection(unittest.TestCase):
+  def test_document_links_and_anchors(self):
+    md = (
+      "# Title\n\nSee [home](/) and [wiki](https://x.org/w).\n\n## Usage\n\n"
+      "- [usage](#usage)\n- ![img](/a.png)\n\n## Usage"
+    )
+    document = parse_document(md)
+    self.assertListEqual(document.links, ["/", "https://x.org/w", "#usage"])
+    self.assertListEqual(
+      document.headings, [(1, "Title", "title"), (2, "Usage", "usage"), (2, "Usage", "usage-1")]
+    )
+    self.assertIn('<h2 id="usage-1">Usage</h2>', document.node.to_html())
+
+  def test_links_from_cached_blocks(self):
+    blocks = {}
+
+    class Cache:
+      def get(self, block):
+        return blocks.get(block)
+
+      def put(self, block, html):
+        blocks[block] = html
+
+    md = "# T\n\n[a & b](/x?a=1&b=2) and [c](/c)"
+    self.assertListEqual(parse_document(md, cache=Cache()).links, ["/x?a=1&b=2", "/c"])
+    self.assertListEqual(parse_document(md, cache=Cache()).links, ["/x?a=1&b=2", "/c"])
+
+  def test_toc(self):
+    headings = [
+      (1, "Title", "title"), (2, "One", "one"), (3, "*Sub*", "sub"), (3, "Two", "two"),
+      (2, "Back", "back"), (4, "Deep", "deep")
+    ]
+    self.assertEqual(
+      toc_node(headings).to_html(), '<ul><li><a href="#one">One</a><ul>'
+      '<li><a href="#sub">Sub</a></li><li><a href="#two">Two</a></li></ul></li>'
+      '<li><a href="#back">Back</a><ul><li><a href="#deep">Deep</a></li></ul></li></ul>'
+    )
+    self.assertIsNone(toc_node([(1, "Title", "title")]))
+
+
+class TestLinkGraph(unittest.TestCase):
+  def test_resolve_link(self):
+    self.assertIsNone(resolve_link("/", "https://x.org/"))
+    self.assertIsNone(resolve_link("/", "mailto:a@b.c"))
+    self.assertEqual(resolve_link("/post/", "#top"), ("/post/", "top"))
+    self.assertEqual(resolve_link("/post/", "../majesty"), ("/majesty", ""))
+    self.assertEqual(resolve_link("/a/notes.html", "b/#x"), ("/a/b/", "x"))
+    self.assertEqual(resolve_link("/", "/majesty/"), ("/majesty/", ""))
+
+  def test_edges_and_broken_links(self):
+    graph = LinkGraph()
+    graph.set_page("content/index.md", "/", "Home", ["/majesty", "/gone", "/img.png"], ["home"])
+    graph.set_page("content/majesty/index.md", "/majesty/", "M", ["/", "/#home", "/#nope"], [])
+    self.assertDictEqual(graph.edges(), {"/": ["/majesty/"], "/majesty/": ["/"]})
+    self.assertListEqual(
+      graph.broken_links(lambda path: path == "/img.png"),
+      [("content/index.md", "/gone"), ("content/majesty/index.md", "/#nope")]
+    )
+
+
+class TestLinkBuild(TempDirTestCase):
+  def setUp(self):
+    super().setUp()
+    self.content = os.path.join(self.root, "content")
+    self.public = os.path.join(self.root, "public")
+    self.template = os.path.join(self.root, "template.html")
+    self.links = os.path.join(self.public, "links.json")
+    os.makedirs(os.path.join(self.content, "post"))
+    self.write(self.template, "<nav>{{ TOC }}</nav>{{ Content }}")
+    self.write(os.path.join(self.content, "index.md"), "# Home\n\n[post](/post#details)")
+    self.write(os.path.join(self.content, "post", "index.md"), "# Post\n\n## Details\n\n[home](/)")
+
+  def build(self):
+    with mock.patch("main.parse_document", wraps=main.parse_document) as parse:
+      generate_pages_recursive(
+        self.content,
+        self.template,
+        self.public,
+        incremental=True,
+        manifest_path=os.path.join(self.root, ".cache", "manifest.json"),
+        links_path=self.links,
+        links_state_path=os.path.join(self.root, ".cache", "links.json")
+      )
+    return parse.call_count
+
+  def test_link_graph_and_toc(self):
+    with self.assertNoLogs("main", level="WARNING"):
+      self.build()
+    with open(self.links) as f:
+      graph = json.load(f)
+    self.assertDictEqual(
+      graph, {
+        "/": {"title": "Home", "links": ["/post/"], "backlinks": ["/post/"]},
+        "/post/": {"title": "Post", "links": ["/"], "backlinks": ["/"]},
+      }
+    )
+    with open(os.path.join(self.public, "post", "index.html")) as f:
+      self.assertTrue(f.read().startswith('<nav><ul><li><a href="#details">Details</a></li></ul>'))
+
+  def test_streamed_pages_have_toc_and_links(self):
+    trees = []
+    for stream_threshold in (main.STREAM_THRESHOLD, 0):
+      public = os.path.join(self.root, f"public-{stream_threshold}")
+      with self.assertNoLogs("main", level="WARNING"):
+        generate_pages_recursive(
+          self.content,
+          self.template,
+          public,
+          stream_threshold=stream_threshold,
+          links_path=os.path.join(public, "links.json"),
+          links_state_path=os.path.join(self.root, f"links-{stream_threshold}.json")
+        )
+      trees.append(read_tree(public))
+    self.assertEqual(trees[0], trees[1])
+    self.assertIn(b'<a href="#details">Details</a>', trees[1][os.path.join("post", "index.html")])
+
+  def test_unchanged_graph_is_not_rechecked(self):
+    self.write(os.path.join(self.content, "index.md"), "# Home\n\n[gone](/gone)")
+    with self.assertLogs("main", level="WARNING"):
+      self.build()
+    with mock.patch("main.report_broken_links") as report, \
+         mock.patch("links.LinkGraph.write") as write, \
+         mock.patch("links.LinkGraph.save") as save:
+      self.assertEqual(self.build(), 0)
+    report.assert_not_called()
+    write.assert_not_called()
+    save.assert_not_called()
+
+  def test_broken_link_reported_without_rebuilding_linking_page(self):
+    self.build()
+    self.write(os.path.join(self.content, "post", "index.md"), "# Post\n\n## Other")
+    with self.assertLogs("main", level="WARNING") as logs:
+      self.assertEqual(self.build(), 1)
+    self.assertIn("broken link /post#details", "\n".join(logs.output))
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,215 @@
+import os
+import unittest
+from unittest import mock
+
+import main
+from main import generate_pages_recursive
+from profiling import BuildProfile
+from testutil import TempDirTestCase, read_tree
+
+TEMPLATE = "<title>{{ Title }}</title><body>{{ Content }}</body>"
+
+
+class TestIncrementalBuild(TempDirTestCase):
+  def setUp(self):
+    super().setUp()
+    self.content = os.path.join(self.root, "content")
+    self.public = os.path.join(self.root, "public")
+    self.template = os.path.join(self.root, "template.html")
+    self.manifest = os.path.join(self.root, ".cache", "manifest.json")
+    os.makedirs(os.path.join(self.content, "post"))
+    self.write(self.template, TEMPLATE)
+    self.write(os.path.join(self.content, "index.md"), "# Home\n\nWelcome **home**")
+    self.write(os.path.join(self.content, "post", "index.md"), "# Post\n\nSome *text*")
+
+  def build(self, dest=None):
+    with mock.patch("main.parse_document", wraps=main.parse_document) as parse:
+      generate_pages_recursive(
+        self.content, self.template, dest or self.public, incremental=True,
+        manifest_path=self.manifest
+      )
+    return parse.call_count
+
+  def test_full_build(self):
+    self.assertEqual(self.build(), 2)
+    self.assertEqual(
+      self.read(os.path.join(self.public, "index.html")),
+      '<title>Home</title><body><div><h1 id="home">Home</h1><p>Welcome <b>home</b></p></div></body>',
+    )
+    self.assertTrue(os.path.exists(self.manifest))
+
+  def test_only_dirty_pages_rebuilt(self):
+    self.build()
+    self.assertEqual(self.build(), 0)
+
+    self.write(os.path.join(self.content, "post", "index.md"), "# Post\n\nEdited")
+    self.assertEqual(self.build(), 1)
+    self.assertIn("Edited", self.read(os.path.join(self.public, "post", "index.html")))
+
+  def test_template_change_rebuilds_all(self):
+    self.build()
+    self.write(self.template, "<h1>{{ Title }}</h1>{{ Content }}")
+    self.assertEqual(self.build(), 2)
+
+  def test_generator_change_rebuilds_all(self):
+    self.build()
+    with mock.patch("main.generator_version", return_value="next"):
+      self.assertEqual(self.build(), 2)
+      self.assertEqual(self.build(), 0)
+    self.assertEqual(self.build(), 2)
+
+  def test_missing_output_rebuilt(self):
+    self.build()
+    os.remove(os.path.join(self.public, "index.html"))
+    self.assertEqual(self.build(), 1)
+    self.assertTrue(os.path.exists(os.path.join(self.public, "index.html")))
+
+  def test_dest_spelled_differently_keeps_outputs(self):
+    self.build()
+    self.assertEqual(self.build(os.path.join(self.root, ".", "public")), 0)
+    # The same directory through a symlink: a rebuilt page does not remove its own output
+    link = os.path.join(self.root, "site")
+    os.symlink(self.public, link)
+    self.assertEqual(self.build(link), 0)
+    self.write(os.path.join(self.content, "post", "index.md"), "# Post\n\nEdited")
+    self.assertEqual(self.build(link), 1)
+    self.assertIn("Edited", self.read(os.path.join(self.public, "post", "index.html")))
+    self.assertEqual(self.build(self.public), 0)
+    self.assertTrue(os.path.exists(os.path.join(self.public, "index.html")))
+
+  def test_removed_source_deletes_output(self):
+    self.build()
+    os.remove(os.path.join(self.content, "post", "index.md"))
+    self.assertEqual(self.build(), 0)
+    self.assertFalse(os.path.exists(os.path.join(self.public, "post", "index.html")))
+    self.assertTrue(os.path.exists(os.path.join(self.public, "index.html")))
+
+
+class TestParallelBuild(TempDirTestCase):
+  def setUp(self):
+    super().setUp()
+    self.content = os.path.join(self.root, "content")
+    self.template = os.path.join(self.root, "template.html")
+    with open(self.template, "w") as f:
+      f.write(TEMPLATE)
+    for i in range(12):
+      os.makedirs(os.path.join(self.content, f"page{i}"))
+      with open(os.path.join(self.content, f"page{i}", "index.md"), "w") as f:
+        f.write(f"# Page {i}\n\nSome **bold** text and a [link](/page{i + 1})\n\n- one\n- two")
+
+  def test_parallel_matches_serial(self):
+    serial = os.path.join(self.root, "serial")
+    parallel = os.path.join(self.root, "parallel")
+    self.assertEqual(generate_pages_recursive(self.content, self.template, serial), [])
+    self.assertEqual(
+      generate_pages_recursive(self.content, self.template, parallel, jobs=3, batch_bytes=1), []
+    )
+    self.assertEqual(read_tree(serial), read_tree(parallel))
+    self.assertEqual(len(read_tree(parallel)), 12)
+
+  def test_single_batch_is_built_inline(self):
+    # Starting workers for a build that fits in one batch costs more than it saves
+    public = os.path.join(self.root, "public")
+    with mock.patch("concurrent.futures.ProcessPoolExecutor") as pool:
+      self.assertEqual(generate_pages_recursive(self.content, self.template, public, jobs=3), [])
+    pool.assert_not_called()
+    self.assertEqual(len(read_tree(public)), 12)
+
+  def test_streamed_pages_match(self):
+    loaded = os.path.join(self.root, "loaded")
+    streamed = os.path.join(self.root, "streamed")
+    generate_pages_recursive(self.content, self.template, loaded)
+    generate_pages_recursive(self.content, self.template, streamed, stream_threshold=0)
+    self.assertEqual(read_tree(loaded), read_tree(streamed))
+
+  def test_streamed_title_is_the_first_h1_block(self):
+    # A "# " line inside a code block is not the title; "# Title\nSubtitle" falls back to
+    # its first line
+    with open(os.path.join(self.content, "page0", "index.md"), "w") as f:
+      f.write("```\n# not the title\n```\n\n## Intro\n\n# Real title\n\nBody")
+    with open(os.path.join(self.content, "page1", "index.md"), "w") as f:
+      f.write("```\n# not the title\n```\n\n# Title\nSubtitle\n\nBody")
+    for stream_threshold in (main.STREAM_THRESHOLD, 0):
+      public = os.path.join(self.root, f"public-{stream_threshold}")
+      errors = generate_pages_recursive(
+        self.content, self.template, public, stream_threshold=stream_threshold
+      )
+      self.assertEqual(errors, [])
+      tree = read_tree(public)
+      page = tree[os.path.join("page0", "index.html")]
+      self.assertTrue(page.startswith(b"<title>Real title</title>"))
+      page = tree[os.path.join("page1", "index.html")]
+      self.assertTrue(page.startswith(b"<title>Title</title>"))
+
+  def test_title_is_escaped(self):
+    with open(os.path.join(self.content, "page0", "index.md"), "w") as f:
+      f.write("# A <b> & C\n\nBody")
+    trees = []
+    for options in ({}, {"stream_threshold": 0}, {"profile": BuildProfile()}):
+      public = os.path.join(self.root, f"public-{len(trees)}")
+      self.assertEqual(generate_pages_recursive(self.content, self.template, public, **options), [])
+      trees.append(read_tree(public))
+      page = trees[-1][os.path.join("page0", "index.html")]
+      self.assertTrue(page.startswith(b"<title>A &lt;b&gt; &amp; C</title>"))
+    self.assertEqual(trees[0], trees[1])
+    self.assertEqual(trees[0], trees[2])
+
+  def test_errors_are_collected(self):
+    broken = os.path.join(self.content, "page3", "index.md")
+    with open(broken, "w") as f:
+      f.write("no title here")
+    public = os.path.join(self.root, "public")
+    errors = generate_pages_recursive(self.content, self.template, public, jobs=3, batch_bytes=1)
+    self.assertEqual([path for path, _ in errors], [broken])
+    self.assertIn("No H1 header found", errors[0][1])
+    self.assertEqual(len(read_tree(public)), 11)
+
+  def test_sources_are_read_as_they_are_built(self):
+    # Decoded sources not yet built; the serial build holds one at a time
+    held = []
+    peak = []
+    decode_text = main.decode_text
+    build_page = main.build_page
+
+    def decode(data):
+      held.append(data)
+      peak.append(len(held))
+      return decode_text(data)
+
+    def build(*args, **kwargs):
+      held.pop()
+      return build_page(*args, **kwargs)
+
+    public = os.path.join(self.root, "public")
+    with mock.patch("main.decode_text", decode), mock.patch("main.build_page", build):
+      self.assertEqual(generate_pages_recursive(self.content, self.template, public), [])
+    self.assertEqual(max(peak), 1)
+    self.assertEqual(len(read_tree(public)), 12)
+
+  def test_iter_batches(self):
+    jobs = [("a", "a", "x" * 3), ("b", "b", None), ("c", "c", "x"), ("d", "d", "x" * 5)]
+    self.assertListEqual(
+      [[job[0] for job in batch] for batch in main.iter_batches(iter(jobs), 4)],
+      [["a", "b"], ["c", "d"]]
+    )
+    self.assertEqual(len(list(main.iter_batches(iter(jobs), 1))), 4)
+
+  def test_unreadable_sources_are_collected(self):
+    # Not UTF-8; a non-markdown file next to it is not a page at all
+    binary = os.path.join(self.content, "binary.md")
+    with open(binary, "wb") as f:
+      f.write(b"# Title\n\n\xff\xfe")
+    with open(os.path.join(self.content, ".DS_Store"), "wb") as f:
+      f.write(b"\x00\x05\x16\x07\xff\xfe")
+    for jobs, io_concurrency in ((1, 0), (3, 0), (1, 2)):
+      public = os.path.join(self.root, f"public-{jobs}-{io_concurrency}")
+      errors = generate_pages_recursive(
+        self.content, self.template, public, jobs=jobs, io_concurrency=io_concurrency, batch_bytes=1
+      )
+      self.assertEqual([path for path, _ in errors], [binary])
+      self.assertIn("UnicodeDecodeError", errors[0][1])
+      self.assertEqual(len(read_tree(public)), 12)
+
+
+if __name__ == "__main__":
+  unittest.main()
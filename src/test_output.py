@@ -0,0 +1,105 @@
+import os
+import unittest
+from unittest import mock
+
+from main import generate_pages_recursive
+from output import open_output, output_stats, read_state, stats_since, write_output, write_state
+from testutil import TempDirTestCase
+
+
+class TestWriteOutput(TempDirTestCase):
+  def setUp(self):
+    super().setUp()
+    self.path = os.path.join(self.root, "post", "index.html")
+
+  def read_bytes(self):
+    with open(self.path, "rb") as f:
+      return f.read()
+
+  def test_unchanged_write_is_skipped(self):
+    self.assertEqual(write_output(self.path, "<p>café</p>"), len("<p>café</p>".encode()))
+    os.utime(self.path, (0, 0))
+    before = output_stats()
+    self.assertEqual(write_output(self.path, "<p>café</p>"), 0)
+    self.assertEqual(os.stat(self.path).st_mtime, 0)
+    self.assertDictEqual(stats_since(before), {"written": 0, "unchanged": 1, "bytes": 0})
+
+    self.assertEqual(write_output(self.path, b"<p>cafe</p>"), 11)
+    self.assertEqual(self.read_bytes(), b"<p>cafe</p>")
+    self.assertListEqual(os.listdir(os.path.dirname(self.path)), ["index.html"])
+
+  def test_open_output(self):
+    with open_output(self.path) as f:
+      f.write("one\n")
+    os.utime(self.path, (0, 0))
+    before = output_stats()
+    with open_output(self.path) as f:
+      f.write("one\n")
+    self.assertEqual(os.stat(self.path).st_mtime, 0)
+    with open_output(self.path) as f:
+      f.write("two!\n")
+    self.assertEqual(self.read_bytes(), b"two!\n")
+    self.assertDictEqual(stats_since(before), {"written": 1, "unchanged": 1, "bytes": 5})
+
+    # A failed render leaves the previous page in place and no temp file behind
+    with self.assertRaises(ValueError), open_output(self.path) as f:
+      f.write("half")
+      raise ValueError("render failed")
+    self.assertEqual(self.read_bytes(), b"two!\n")
+    self.assertListEqual(os.listdir(os.path.dirname(self.path)), ["index.html"])
+
+  def test_write_state(self):
+    state_path = os.path.join(self.root, ".cache", "state.json")
+    before = output_stats()
+    write_state(state_path, {"version": 1, "pages": {}}, indent=1)
+    write_state(state_path, {"version": 1, "pages": {"a": 1}}, separators=(",", ":"))
+    self.assertEqual(self.read(state_path), '{"version":1,"pages":{"a":1}}')
+    self.assertListEqual(os.listdir(os.path.dirname(state_path)), ["state.json"])
+    # State is not site output
+    self.assertDictEqual(stats_since(before), {"written": 0, "unchanged": 0, "bytes": 0})
+
+    # A failed write leaves the previous state whole and no temp file behind
+    with mock.patch("os.replace", side_effect=OSError("disk full")):
+      with self.assertRaises(OSError):
+        write_state(state_path, {})
+    self.assertEqual(self.read(state_path), '{"version":1,"pages":{"a":1}}')
+    self.assertListEqual(os.listdir(os.path.dirname(state_path)), ["state.json"])
+
+  def test_read_state(self):
+    state_path = os.path.join(self.root, "state.json")
+    self.assertDictEqual(read_state(state_path, {}), {})
+    write_state(state_path, {"version": 1, "pages": {"a": 1}})
+    self.assertDictEqual(read_state(state_path, {}), {"version": 1, "pages": {"a": 1}})
+    # A truncated file is as good as a missing one
+    self.write(state_path, '{"version": 1, "pa')
+    self.assertListEqual(read_state(state_path, []), [])
+
+
+class TestUnchangedRebuild(TempDirTestCase):
+  def setUp(self):
+    super().setUp()
+    self.content = os.path.join(self.root, "content")
+    self.public = os.path.join(self.root, "public")
+    self.template = os.path.join(self.root, "template.html")
+    os.makedirs(os.path.join(self.content, "post"))
+    self.write(self.template, "<title>{{ Title }}</title>{{ Content }}")
+    self.write(os.path.join(self.content, "index.md"), "# Home\n\nWelcome")
+    self.write(os.path.join(self.content, "post", "index.md"), "# Post\n\nSome *text*")
+
+  def test_full_rebuild_writes_only_changed_pages(self):
+    generate_pages_recursive(self.content, self.template, self.public)
+    before = output_stats()
+    generate_pages_recursive(self.content, self.template, self.public)
+    self.assertDictEqual(stats_since(before), {"written": 0, "unchanged": 2, "bytes": 0})
+
+    self.write(os.path.join(self.content, "post", "index.md"), "# Post\n\nOther")
+    before = output_stats()
+    with self.assertLogs("main", level="INFO") as logs:
+      generate_pages_recursive(self.content, self.template, self.public, jobs=2, batch_bytes=1)
+    written = stats_since(before)
+    self.assertEqual((written["written"], written["unchanged"]), (1, 1))
+    self.assertIn(f"Wrote {written['bytes']} bytes to 1 files, 1 unchanged", "\n".join(logs.output))
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,78 @@
+import os
+import asyncio
+import tempfile
+import unittest
+
+from main import generate_pages_recursive
+from pipeline import run_pipeline
+from testutil import TempDirTestCase, read_tree
+
+
+class TestPipeline(unittest.TestCase):
+  def test_run_pipeline(self):
+    with tempfile.TemporaryDirectory() as root:
+      pages = [(f"src{i}", os.path.join(root, f"out{i}.html")) for i in range(20)]
+
+      def read(path):
+        if path == "src3":
+          raise OSError("unreadable")
+        return path.upper()
+
+      def plan(content_file_path, dest_file_path, source):
+        return None if source == "SRC5" else (content_file_path, dest_file_path, source)
+
+      def render(job):
+        if job[0] == "src7":
+          raise ValueError("bad markdown")
+        return f"<p>{job[2]}</p>"
+
+      planned, errors = asyncio.run(
+        run_pipeline(pages, read, plan, render, readers=3, writers=2, queue_size=2)
+      )
+      self.assertEqual(len(planned), 18)
+      self.assertIn(("src12", os.path.join(root, "out12.html")), planned)
+      self.assertListEqual(
+        sorted(errors), [("src3", "OSError: unreadable"), ("src7", "ValueError: bad markdown")]
+      )
+      self.assertEqual(len(os.listdir(root)), 17)
+      with open(os.path.join(root, "out12.html")) as f:
+        self.assertEqual(f.read(), "<p>SRC12</p>")
+
+
+class TestAsyncBuild(TempDirTestCase):
+  def setUp(self):
+    super().setUp()
+    self.content = os.path.join(self.root, "content")
+    self.template = os.path.join(self.root, "template.html")
+    with open(self.template, "w") as f:
+      f.write("<title>{{ Title }}</title>{{ Content }}")
+    for i in range(10):
+      os.makedirs(os.path.join(self.content, f"page{i}"))
+      with open(os.path.join(self.content, f"page{i}", "index.md"), "w") as f:
+        f.write(f"# Page {i}\n\n1. one\n2. *two*\n\n```\ncode\n```")
+
+  def test_async_matches_serial(self):
+    serial = os.path.join(self.root, "serial")
+    pipelined = os.path.join(self.root, "pipelined")
+    streamed = os.path.join(self.root, "streamed")
+    generate_pages_recursive(self.content, self.template, serial)
+    generate_pages_recursive(self.content, self.template, pipelined, io_concurrency=4, queue_size=2)
+    generate_pages_recursive(
+      self.content, self.template, streamed, io_concurrency=4, stream_threshold=0
+    )
+    self.assertEqual(len(read_tree(serial)), 10)
+    self.assertEqual(read_tree(serial), read_tree(pipelined))
+    self.assertEqual(read_tree(serial), read_tree(streamed))
+
+  def test_async_incremental(self):
+    public = os.path.join(self.root, "public")
+    manifest = os.path.join(self.root, "manifest.json")
+    kwargs = {"incremental": True, "manifest_path": manifest, "io_concurrency": 4}
+    self.assertEqual(generate_pages_recursive(self.content, self.template, public, **kwargs), [])
+    os.remove(os.path.join(self.content, "page3", "index.md"))
+    self.assertEqual(generate_pages_recursive(self.content, self.template, public, **kwargs), [])
+    self.assertEqual(len(read_tree(public)), 9)
+
+
+if __name__ == "__main__":
+  unittest.main()
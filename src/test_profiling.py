@@ -0,0 +1,97 @@
+import os
+import unittest
+
+from main import generate_pages_recursive
+from process import markdown_to_html_node
+from profiling import BUILD_STAGES, NULL_PROFILE, BuildProfile
+from testutil import TempDirTestCase
+
+
+class TestBuildProfile(unittest.TestCase):
+  def test_stage_and_page_totals(self):
+    profile = BuildProfile()
+    with profile.page("a.md"):
+      profile.record("read", 0.5)
+      profile.record("write", 0.25)
+    with profile.page("b.md"):
+      profile.record("read", 1.0)
+    profile.record("read", 2.0)
+    self.assertEqual(profile.stages["read"], [3.5, 3])
+    self.assertDictEqual(profile.pages["a.md"], {"read": 0.5, "write": 0.25})
+    self.assertListEqual(profile.slowest_pages(1), [("b.md", 1.0)])
+
+  def test_merge(self):
+    first, second = BuildProfile(), BuildProfile()
+    with first.page("a.md"):
+      first.record("read", 1.0)
+    with second.page("a.md"):
+      second.record("read", 2.0)
+      second.record("write", 1.0)
+    first.merge(second)
+    self.assertEqual(first.stages["read"], [3.0, 2])
+    self.assertDictEqual(first.pages["a.md"], {"read": 3.0, "write": 1.0})
+
+  def test_parser_stages(self):
+    profile = BuildProfile()
+    node = markdown_to_html_node("# Title\n\nSome **text**", profile)
+    self.assertEqual(node, markdown_to_html_node("# Title\n\nSome **text**", NULL_PROFILE))
+    self.assertSetEqual(set(profile.stages), {"block_split", "block_classify", "inline_parse"})
+
+  def test_report(self):
+    profile = BuildProfile()
+    with profile.page("a.md"):
+      profile.record("read", 0.001)
+    report = profile.report()
+    self.assertIn("read", report)
+    self.assertIn("slowest 1 of 1 pages", report)
+
+
+class TestProfiledBuild(TempDirTestCase):
+  def setUp(self):
+    super().setUp()
+    self.content = os.path.join(self.root, "content")
+    self.template = os.path.join(self.root, "template.html")
+    os.makedirs(self.content)
+    with open(self.template, "w") as f:
+      f.write("<title>{{ Title }}</title>{{ Content }}")
+    for i in range(4):
+      with open(os.path.join(self.content, f"page{i}.md"), "w") as f:
+        f.write(f"# Page {i}\n\n- a *list*\n- b\n\n> quote")
+
+  def test_profiled_build(self):
+    for jobs in [1, 2]:
+      profile = BuildProfile()
+      public = os.path.join(self.root, f"public{jobs}")
+      generate_pages_recursive(
+        self.content, self.template, public, jobs=jobs, profile=profile, batch_bytes=1
+      )
+      self.assertTrue(set(BUILD_STAGES).issubset(profile.stages))
+      self.assertEqual(profile.stages["write"][1], 4)
+      self.assertEqual(len(profile.pages), 4)
+
+    # With the block cache, misses are still reported under block_classify and inline_parse
+    profiles = []
+    for run in range(2):
+      profiles.append(BuildProfile())
+      generate_pages_recursive(
+        self.content, self.template, os.path.join(self.root, f"cached{run}"),
+        profile=profiles[-1], cache_path=os.path.join(self.root, "blocks.sqlite")
+      )
+    self.assertTrue(set(BUILD_STAGES).issubset(profiles[0].stages))
+    # The pages share their list and quote, so only the first page misses
+    self.assertEqual(profiles[0].stages["block_classify"][1], 2)
+    # The second build hits the cache for every block but the headings
+    self.assertNotIn("block_classify", profiles[1].stages)
+    self.assertEqual(profiles[1].stages["inline_parse"][1], 4)
+    self.assertEqual(profiles[1].stages["block_cache"][1], 8)
+
+    plain = os.path.join(self.root, "plain")
+    generate_pages_recursive(self.content, self.template, plain)
+    for name in os.listdir(plain):
+      self.assertEqual(
+        self.read(os.path.join(plain, name)), self.read(os.path.join(self.root, "public1", name))
+      )
+
+
+if __name__ == "__main__":
+  unittest.main()
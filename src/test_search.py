@@ -0,0 +1,139 @@
+import os
+import shutil
+import unittest
+from unittest import mock
+
+import main
+from main import generate_pages_recursive
+from htmlnode import LeafNode, ParentNode, RawNode
+from search import (
+  SearchIndex, decode_index, decode_varint, encode_varint, page_postings, page_url, search
+)
+from testutil import TempDirTestCase
+
+
+class TestSearchIndex(unittest.TestCase):
+  def test_varint_round_trip(self):
+    for value in [0, 1, 127, 128, 300, 16383, 16384, 2**35 + 7]:
+      out = bytearray(b"x")
+      encode_varint(value, out)
+      self.assertEqual(decode_varint(bytes(out), 1), (value, len(out)))
+    out = bytearray()
+    encode_varint(300, out)
+    self.assertEqual(bytes(out), b"\xac\x02")
+
+  def test_page_postings(self):
+    node = ParentNode("div", [
+      ParentNode("p", [LeafNode("The ring, the "), LeafNode("Ring", "b")]),
+      RawNode("<p>ring &amp; <i>shire</i></p>"),
+    ])
+    self.assertDictEqual(
+      page_postings(node), {"the": [0, 2], "ring": [1, 3, 4], "shire": [5]}
+    )
+
+  def test_page_url(self):
+    self.assertEqual(page_url("public", os.path.join("public", "index.html")), "/")
+    self.assertEqual(page_url("public/", "public/a/b/index.html"), "/a/b/")
+    self.assertEqual(page_url("public", "public/a/notes.html"), "/a/notes.html")
+
+  def test_encode_decode(self):
+    index = SearchIndex()
+    index.set_page("content/b.md", "/b/", "Bee", {"shire": [3], "ring": [0, 9, 200]})
+    index.set_page("content/a.md", "/a/", "Ay", {"ring": [5], "rings": [6]})
+    pages, postings = decode_index(index.encode())
+    self.assertListEqual(pages, [("/a/", "Ay"), ("/b/", "Bee")])
+    self.assertDictEqual(
+      postings, {
+        "ring": [(0, [5]), (1, [0, 9, 200])],
+        "rings": [(0, [6])],
+        "shire": [(1, [3])],
+      }
+    )
+    data = index.encode()
+    self.assertListEqual(search(data, "Ring"), ["/a/", "/b/"])
+    self.assertListEqual(search(data, "ring shire"), ["/b/"])
+    self.assertListEqual(search(data, "mordor"), [])
+
+    with self.assertRaises(ValueError):
+      decode_index(b"nope")
+
+
+class TestSearchBuild(TempDirTestCase):
+  def setUp(self):
+    super().setUp()
+    self.content = os.path.join(self.root, "content")
+    self.public = os.path.join(self.root, "public")
+    self.template = os.path.join(self.root, "template.html")
+    self.index_path = os.path.join(self.public, "search.idx")
+    os.makedirs(os.path.join(self.content, "post"))
+    self.write(self.template, "<title>{{ Title }}</title>{{ Content }}")
+    self.write(os.path.join(self.content, "index.md"), "# Home\n\nWelcome to the shire")
+    self.write(os.path.join(self.content, "post", "index.md"), "# Post\n\nOne ring")
+
+  def build(self, **kwargs):
+    with mock.patch("main.parse_document", wraps=main.parse_document) as parse:
+      errors = generate_pages_recursive(
+        self.content,
+        self.template,
+        self.public,
+        incremental=True,
+        manifest_path=os.path.join(self.root, ".cache", "manifest.json"),
+        search_path=self.index_path,
+        search_state_path=os.path.join(self.root, ".cache", "search.json"),
+        **kwargs
+      )
+    self.assertListEqual(errors, [])
+    return parse.call_count
+
+  def search(self, query):
+    with open(self.index_path, "rb") as f:
+      return search(f.read(), query)
+
+  def test_incremental_index(self):
+    self.assertEqual(self.build(), 2)
+    self.assertListEqual(self.search("ring"), ["/post/"])
+    self.assertListEqual(self.search("shire"), ["/"])
+
+    self.write(os.path.join(self.content, "post", "index.md"), "# Post\n\nThe shire")
+    self.assertEqual(self.build(), 1)
+    self.assertListEqual(self.search("ring"), [])
+    self.assertListEqual(self.search("shire"), ["/", "/post/"])
+
+    os.remove(os.path.join(self.content, "index.md"))
+    self.assertEqual(self.build(), 0)
+    self.assertListEqual(self.search("shire"), ["/post/"])
+
+  def test_unchanged_index_is_not_rewritten(self):
+    self.build()
+    with mock.patch("search.SearchIndex.encode") as encode, \
+         mock.patch("search.SearchIndex.save") as save:
+      self.assertEqual(self.build(), 0)
+      # A rebuilt page with the same terms leaves the index as it is
+      self.write(os.path.join(self.content, "index.md"), "# Home\n\nWelcome  to the shire")
+      self.assertEqual(self.build(), 1)
+    encode.assert_not_called()
+    save.assert_not_called()
+
+    os.remove(self.index_path)
+    self.build()
+    self.assertListEqual(self.search("ring"), ["/post/"])
+
+  def test_missing_state_reindexes(self):
+    self.build()
+    os.remove(os.path.join(self.root, ".cache", "search.json"))
+    self.assertEqual(self.build(), 2)
+    self.assertListEqual(self.search("welcome"), ["/"])
+
+  def test_parallel_and_pipeline_builds(self):
+    self.build(jobs=2, batch_bytes=1)
+    with open(self.index_path, "rb") as f:
+      expected = f.read()
+    for kwargs in [{"jobs": 2, "batch_bytes": 1}, {"io_concurrency": 2}]:
+      shutil.rmtree(os.path.join(self.root, ".cache"))
+      self.build(**kwargs)
+      with open(self.index_path, "rb") as f:
+        self.assertEqual(f.read(), expected)
+
+
+if __name__ == "__main__":
+  unittest.main()
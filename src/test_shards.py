@@ -0,0 +1,116 @@
+import os
+import unittest
+
+from main import generate_pages_recursive
+from search import search
+from shards import assign_shards, build_shard, main, merge_shards, plan_build, run_local
+from testutil import TempDirTestCase, png_header, read_tree
+
+
+class TestAssignShards(unittest.TestCase):
+  def test_balanced_by_bytes(self):
+    sizes = {"huge.md": 1000, "a.md": 10, "b.md": 10, "c.md": 10, "big.md": 600, "mid.md": 400}
+    assignment = assign_shards(sizes, 2)
+    loads = [0, 0]
+    for source, shard in assignment.items():
+      loads[shard] += sizes[source]
+    self.assertListEqual(sorted(loads), [1010, 1020])
+    # Balanced by bytes, not file count: the huge page shares its shard with small ones only
+    self.assertEqual(assignment["big.md"], assignment["mid.md"])
+    self.assertNotEqual(assignment["big.md"], assignment["huge.md"])
+
+  def test_deterministic(self):
+    sizes = {f"{i}.md": i % 7 for i in range(50)}
+    self.assertDictEqual(assign_shards(sizes, 4), assign_shards(dict(reversed(sizes.items())), 4))
+    self.assertSetEqual(set(assign_shards(sizes, 4).values()), {0, 1, 2, 3})
+
+
+class TestShardedBuild(TempDirTestCase):
+  def setUp(self):
+    super().setUp()
+    self.content = os.path.join(self.root, "content")
+    self.template = os.path.join(self.root, "template.html")
+    self.manifest = os.path.join(self.root, "work", "manifest.json")
+    with open(self.template, "w") as f:
+      f.write("<title>{{ Title }}</title>{{ Content }}")
+    for i in range(7):
+      os.makedirs(os.path.join(self.content, f"page{i}"))
+      with open(os.path.join(self.content, f"page{i}", "index.md"), "w") as f:
+        f.write(f"# Page {i}\n\n" + f"Word{i} text\n\n" * (i * 20 + 1))
+
+  def test_shards_match_single_build(self):
+    single = os.path.join(self.root, "single")
+    generate_pages_recursive(self.content, self.template, single)
+
+    sharded = os.path.join(self.root, "sharded")
+    manifest = plan_build(self.content, self.template, sharded, self.manifest, 3)
+    self.assertEqual(manifest, plan_build(self.content, self.template, sharded, self.manifest, 3))
+    self.assertSetEqual({page["shard"] for page in manifest["pages"]}, {0, 1, 2})
+
+    for shard in range(3):
+      self.assertListEqual(build_shard(self.manifest, shard), [])
+    index_path = os.path.join(self.root, "search.idx")
+    self.assertListEqual(merge_shards(self.manifest, index_path), [])
+    self.assertDictEqual(read_tree(sharded), read_tree(single))
+    with open(index_path, "rb") as f:
+      data = f.read()
+    self.assertListEqual(search(data, "word3"), ["/page3/"])
+    self.assertEqual(len(search(data, "text")), 7)
+    # Shards leave their terms and links for the merge, not an index or graph of their own
+    self.assertListEqual(
+      sorted(os.listdir(os.path.dirname(self.manifest))),
+      ["manifest.json"] + [
+        f"shard-{shard}{suffix}" for shard in range(3)
+        for suffix in ("-links.json", "-search.json", ".json")
+      ]
+    )
+
+  def test_merge_requires_every_shard(self):
+    plan_build(self.content, self.template, os.path.join(self.root, "public"), self.manifest, 2)
+    build_shard(self.manifest, 0)
+    with self.assertRaises(ValueError):
+      merge_shards(self.manifest)
+    with self.assertRaises(ValueError):
+      build_shard(self.manifest, 2)
+
+  def test_main_paths(self):
+    # Paths come from the arguments; asset and image state stays next to the manifest
+    static = os.path.join(self.root, "static")
+    os.makedirs(static)
+    with open(os.path.join(static, "logo.png"), "wb") as f:
+      f.write(png_header(40, 30))
+    dest = os.path.join(self.root, "public")
+    paths = [
+      "--content", self.content, "--template", self.template, "--static", static, "--dest", dest,
+      "--cache-dir", os.path.join(self.root, ".cache")
+    ]
+    cwd = os.getcwd()
+    self.addCleanup(os.chdir, cwd)
+    os.chdir(self.root)
+    main(paths + ["plan", "2"])
+    for shard in range(2):
+      main(paths + ["build", str(shard)])
+    main(paths + ["merge"])
+    work = os.path.join(self.root, ".cache", "work")
+    self.assertTrue(os.path.exists(os.path.join(work, "manifest.json")))
+    self.assertTrue(os.path.exists(os.path.join(work, "images.json")))
+    self.assertTrue(os.path.exists(os.path.join(work, "assets.json")))
+    self.assertListEqual(
+      sorted(os.listdir(self.root)), [".cache", "content", "public", "static", "template.html"]
+    )
+    self.assertSetEqual(
+      set(read_tree(dest)),
+      {"links.json", "logo.png", "search.idx"} |
+      {os.path.join(f"page{i}", "index.html") for i in range(7)}
+    )
+
+  def test_local_processes(self):
+    dest = os.path.join(self.root, "public")
+    plan_build(self.content, self.template, dest, self.manifest, 2)
+    self.assertListEqual(run_local(self.manifest, 2), [0, 0])
+    self.assertListEqual(merge_shards(self.manifest), [])
+    self.assertEqual(len(read_tree(dest)), 7)
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,50 @@
+import os
+import tempfile
+import unittest
+
+from io import StringIO
+
+from htmlnode import LeafNode, ParentNode
+from template import Template, load_template
+
+
+class TestTemplate(unittest.TestCase):
+  def test_parse(self):
+    template = Template("<title>{{ Title }}</title>{{Content}}<footer>{{ Date }}</footer>")
+    self.assertListEqual(template.chunks, ["<title>", "</title>", "<footer>", "</footer>"])
+    self.assertListEqual(template.slots, ["Title", "Content", "Date"])
+
+  def test_render(self):
+    template = Template("<title> {{ Title }} </title><nav>{{ Toc }}</nav>{{ Content }}")
+    content = ParentNode("div", [LeafNode(tag="p", value="Hello")])
+    values = {"Title": "Home", "Content": content, "Toc": "<ul></ul>"}
+    self.assertEqual(
+      template.render(values),
+      "<title> Home </title><nav><ul></ul></nav><div><p>Hello</p></div>",
+    )
+    out = StringIO()
+    template.write(out, values)
+    self.assertEqual(out.getvalue(), template.render(values))
+
+  def test_missing_slot_renders_empty(self):
+    self.assertEqual(Template("a{{ Date }}b").render({}), "ab")
+    self.assertEqual(Template("no slots").render({"Title": "x"}), "no slots")
+
+  def test_load_template_cache(self):
+    with tempfile.TemporaryDirectory() as root:
+      path = os.path.join(root, "template.html")
+      with open(path, "w") as f:
+        f.write("<h1>{{ Title }}</h1>")
+      template = load_template(path)
+      self.assertIs(load_template(path), template)
+
+      with open(path, "w") as f:
+        f.write("<h2>{{ Title }}</h2>{{ Content }}")
+      reloaded = load_template(path)
+      self.assertIsNot(reloaded, template)
+      self.assertListEqual(reloaded.slots, ["Title", "Content"])
+      self.assertNotEqual(reloaded.digest, template.digest)
+
+
+if __name__ == "__main__":
+  unittest.main()
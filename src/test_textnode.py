@@ -32,5 +32,11 @@ class TestTextNode(unittest.TestCase):
     node_string = node.__repr__()
     self.assertEqual(node_string, "TextNode(Sample text, normal, https://www.google.com)")
 
+  def test_slots(self):
+    node = TextNode("Sample text", TextType.NORMAL)
+    self.assertFalse(hasattr(node, "__dict__"))
+    with self.assertRaises(AttributeError):
+      node.extra = "not a node attribute"
+
 if __name__ == "__main__":
   unittest.main()
@@ -0,0 +1,138 @@
+import os
+import unittest
+import urllib.request
+from unittest import mock
+
+from cache import BlockCache
+from main import build_site, generate_pages_recursive
+from watch import SiteWatcher, diff_snapshots, scan_tree, serve
+from testutil import TempDirTestCase, png_header
+
+
+class TestWatch(TempDirTestCase):
+  def setUp(self):
+    super().setUp()
+    self.content = os.path.join(self.root, "content")
+    self.static = os.path.join(self.root, "static")
+    self.public = os.path.join(self.root, "public")
+    self.template = os.path.join(self.root, "template.html")
+    os.makedirs(os.path.join(self.content, "post"))
+    os.makedirs(self.static)
+    self.write(self.template, "<title>{{ Title }}</title>{{ Content }}")
+    self.write(os.path.join(self.content, "index.md"), "# Home\n\nWelcome")
+    self.write(os.path.join(self.content, "post", "index.md"), "# Post\n\nText")
+    self.write(os.path.join(self.static, "index.css"), "body {}")
+    self.cache_dir = os.path.join(self.root, ".cache")
+    generate_pages_recursive(self.content, self.template, self.public)
+    self.watcher = SiteWatcher(
+      self.content, self.static, self.template, self.public, self.cache_dir
+    )
+
+  def write(self, path, text):
+    with open(path, "w") as f:
+      f.write(text)
+    # Make sure the change is visible even on coarse mtime filesystems
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+  def test_diff_snapshots(self):
+    old = {"a": (1, 1), "b": (1, 1), "c": (1, 1)}
+    new = {"a": (1, 1), "b": (2, 1), "d": (1, 1)}
+    self.assertEqual(diff_snapshots(old, new), (["b", "d"], ["c"]))
+
+  def test_scan_tree(self):
+    snapshot = scan_tree(self.content)
+    self.assertEqual(
+      sorted(snapshot),
+      [os.path.join(self.content, "index.md"), os.path.join(self.content, "post", "index.md")]
+    )
+    self.assertEqual(list(scan_tree(self.template)), [self.template])
+
+  def test_no_changes(self):
+    self.assertEqual(self.watcher.poll(), [])
+
+  def test_page_change_rebuilds_only_that_page(self):
+    post = os.path.join(self.content, "post", "index.md")
+    self.write(post, "# Post\n\nEdited")
+    self.assertEqual(self.watcher.poll(), [post])
+    self.assertIn("Edited", self.read(os.path.join(self.public, "post", "index.html")))
+
+    os.remove(post)
+    self.assertEqual(self.watcher.poll(), [post])
+    self.assertFalse(os.path.exists(os.path.join(self.public, "post", "index.html")))
+
+  def test_asset_change_copies_asset(self):
+    css = os.path.join(self.static, "index.css")
+    self.write(css, "body { color: red; }")
+    self.assertEqual(self.watcher.poll(), [css])
+    self.assertEqual(self.read(os.path.join(self.public, "index.css")), "body { color: red; }")
+
+  def test_template_change_rebuilds_site(self):
+    self.write(self.template, "<h1>{{ Title }}</h1>")
+    self.assertEqual(self.watcher.poll(), [self.template])
+    self.assertEqual(self.read(os.path.join(self.public, "post", "index.html")), "<h1>Post</h1>")
+
+  def test_image_change_rebuilds_pages_showing_it(self):
+    self.write(os.path.join(self.content, "index.md"), "# Home\n\n![logo](/logo.png)")
+    with open(os.path.join(self.static, "logo.png"), "wb") as f:
+      f.write(png_header(40, 30))
+    build_site(self.content, self.template, self.public, self.static, self.cache_dir)
+    cache = BlockCache(os.path.join(self.cache_dir, "blocks.sqlite"))
+    self.addCleanup(cache.close)
+    watcher = SiteWatcher(
+      self.content, self.static, self.template, self.public, self.cache_dir, cache=cache
+    )
+    home = os.path.join(self.public, "index.html")
+    self.assertIn('width="40" height="30"', self.read(home))
+
+    # Rebuilt pages keep their image sizes
+    self.write(self.template, "<h1>{{ Title }}</h1>{{ Content }}")
+    watcher.poll()
+    self.assertIn('width="40" height="30"', self.read(home))
+
+    logo = os.path.join(self.static, "logo.png")
+    with open(logo, "wb") as f:
+      f.write(png_header(80, 60))
+    stat = os.stat(logo)
+    os.utime(logo, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    with self.assertLogs("watch", level="INFO") as logs:
+      self.assertEqual(watcher.poll(), [logo])
+    self.assertIn("copied asset, rebuilt 1 of 1 pages", "\n".join(logs.output))
+    self.assertIn('width="80" height="60"', self.read(home))
+
+  def test_failed_events_do_not_stop_the_watcher(self):
+    swap = os.path.join(self.content, ".index.md.swp")
+    with open(swap, "wb") as f:
+      f.write(b"\xff\xfe\x00")
+    self.assertEqual(self.watcher.poll(), [])
+
+    post = os.path.join(self.content, "post", "index.md")
+    with open(post, "wb") as f:
+      f.write(b"# Post\n\n\xff")
+    with self.assertLogs("watch", level="ERROR") as logs:
+      self.assertEqual(self.watcher.poll(), [post])
+    self.assertIn("UnicodeDecodeError", "\n".join(logs.output))
+
+    # Gone again before the handler runs
+    with mock.patch("watch.copy_file", side_effect=FileNotFoundError("index.css")):
+      self.write(os.path.join(self.static, "index.css"), "a {}")
+      with self.assertLogs("watch", level="ERROR"):
+        self.watcher.poll()
+
+    self.write(post, "# Post\n\nFixed")
+    self.assertEqual(self.watcher.poll(), [post])
+    self.assertIn("Fixed", self.read(os.path.join(self.public, "post", "index.html")))
+
+  def test_serve(self):
+    server = serve(self.public, port=0)
+    try:
+      url = f"http://localhost:{server.server_address[1]}/index.html"
+      with urllib.request.urlopen(url) as response:
+        self.assertIn(b"<title>Home</title>", response.read())
+    finally:
+      server.shutdown()
+      server.server_close()
+
+
+if __name__ == "__main__":
+  unittest.main()
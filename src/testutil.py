@@ -0,0 +1,37 @@
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+
+
+class TempDirTestCase(unittest.TestCase):
+  # Each test gets a fresh directory in self.root, removed afterwards
+  def setUp(self):
+    self.root = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, self.root)
+
+  def write(self, path, data):
+    # Text or bytes; missing parent directories are created
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb" if isinstance(data, bytes) else "w") as f:
+      f.write(data)
+
+  def read(self, path):
+    with open(path, "r") as f:
+      return f.read()
+
+
+def read_tree(path):
+  # Relative path -> bytes of every file under path
+  tree = {}
+  for root, _, files in os.walk(path):
+    for file_name in files:
+      with open(os.path.join(root, file_name), "rb") as f:
+        tree[os.path.relpath(os.path.join(root, file_name), path)] = f.read()
+  return tree
+
+
+def png_header(width, height):
+  # Enough of a PNG for images.image_size
+  return b"\x89PNG\r\n\x1a\n" + struct.pack(">I", 13) + b"IHDR" + struct.pack(">II", width, height)
@@ -0,0 +1,203 @@
+import os
+import time
+import logging
+import threading
+
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+from typing import TYPE_CHECKING, Iterable, Iterator, Union
+
+from assets import copy_file
+from depgraph import DependencyGraph
+from images import IMAGE_EXTENSIONS, process_images
+from template import load_template
+from main import CACHE_DIR, PageJob, build_batch, decode_text, page_dest_path, page_inputs
+
+if TYPE_CHECKING:
+  from cache import BlockCache
+
+logger = logging.getLogger(__name__)
+
+
+def scan_tree(root: str) -> dict[str, tuple[int, int]]:
+  snapshot = {}
+  if os.path.isfile(root):
+    stat = os.stat(root)
+    snapshot[root] = (stat.st_mtime_ns, stat.st_size)
+    return snapshot
+
+  stack = [root]
+  while stack:
+    try:
+      entries = list(os.scandir(stack.pop()))
+    except FileNotFoundError:
+      continue
+    for entry in entries:
+      if entry.is_dir(follow_symlinks=False):
+        stack.append(entry.path)
+      else:
+        stat = entry.stat()
+        snapshot[entry.path] = (stat.st_mtime_ns, stat.st_size)
+  return snapshot
+
+
+def diff_snapshots(old: dict, new: dict) -> tuple[list[str], list[str]]:
+  changed = sorted(path for path, key in new.items() if old.get(path) != key)
+  removed = sorted(path for path in old if path not in new)
+  return changed, removed
+
+
+class SiteWatcher:
+  def __init__(
+    self,
+    content_dir_path: str,
+    static_dir_path: str,
+    template_path: str,
+    dest_dir_path: str,
+    cache_dir_path: str = CACHE_DIR,
+    images: Union[dict, None] = None,
+    cache: Union["BlockCache", None] = None
+  ) -> None:
+    # Pages are rebuilt as a full build renders them: with the image table and, if given,
+    # the block cache. `images` defaults to the table process_images keeps under
+    # cache_dir_path, which is cheap to recompute while the images are unchanged.
+    self.content_dir_path = content_dir_path
+    self.static_dir_path = static_dir_path
+    self.template_path = template_path
+    self.dest_dir_path = dest_dir_path
+    self.cache_dir_path = cache_dir_path
+    self.cache = cache
+    self.images = images if images is not None else self.process_images()
+    # Which pages show which images: recorded by the last build, kept current here
+    self.graph = DependencyGraph.load(os.path.join(cache_dir_path, "manifest.json"))
+    self.snapshots = {path: scan_tree(path) for path in self.watched_paths()}
+
+  def watched_paths(self) -> list[str]:
+    return [self.content_dir_path, self.static_dir_path, self.template_path]
+
+  def poll(self) -> list[str]:
+    events = []
+    for path in self.watched_paths():
+      snapshot = scan_tree(path) if os.path.exists(path) else {}
+      changed, removed = diff_snapshots(self.snapshots[path], snapshot)
+      self.snapshots[path] = snapshot
+      for changed_path in changed:
+        if self.is_source(path, changed_path):
+          events.append(self.handle(path, changed_path, removed=False))
+      for removed_path in removed:
+        if self.is_source(path, removed_path):
+          events.append(self.handle(path, removed_path, removed=True))
+    return events
+
+  def is_source(self, root: str, path: str) -> bool:
+    # Editor swap files and other non-markdown files under content/ are not pages
+    return root != self.content_dir_path or path.endswith(".md")
+
+  def handle(self, root: str, path: str, removed: bool) -> str:
+    # A failed event is logged and the watcher keeps running; the file may have changed
+    # again or disappeared since the scan
+    start = time.perf_counter()
+    try:
+      if root == self.template_path:
+        if removed:
+          action = "ignored removed template"
+        else:
+          pages = sorted(
+            page for page in self.snapshots[self.content_dir_path] if page.endswith(".md")
+          )
+          action = "rebuilt site" if not self.build_pages(pages) else "failed site"
+      elif root == self.content_dir_path:
+        action = self.handle_page(path, removed)
+      else:
+        action = self.handle_asset(path, removed)
+    except Exception as e:
+      logger.error(f"Error handling {path}: {type(e).__name__}: {e}")
+      action = "failed"
+    elapsed = (time.perf_counter() - start) * 1000
+    logger.info(f"{action} for {path} in {elapsed:.1f}ms")
+    return path
+
+  def process_images(self) -> dict[str, dict]:
+    return process_images(
+      self.static_dir_path, self.dest_dir_path, os.path.join(self.cache_dir_path, "images.json"),
+      os.path.join(self.cache_dir_path, "images")
+    )
+
+  def build_pages(self, paths: Iterable[str]) -> list[tuple[str, str]]:
+    # Sources are read as they are built; read errors are reported like failed pages
+    errors = []
+
+    def jobs() -> Iterator[PageJob]:
+      for path in paths:
+        try:
+          with open(path, "rb") as f:
+            markdown = decode_text(f.read())
+        except (OSError, UnicodeDecodeError) as e:
+          errors.append((path, f"{type(e).__name__}: {e}"))
+          continue
+        dest_file_path = page_dest_path(self.content_dir_path, self.dest_dir_path, path)
+        self.graph.set_page(
+          path, dest_file_path,
+          page_inputs(path, markdown, self.template_path, self.static_dir_path)
+        )
+        yield path, dest_file_path, markdown
+
+    template = load_template(self.template_path)
+    errors += build_batch(jobs(), template, cache=self.cache, images=self.images)
+    for content_file_path, message in errors:
+      logger.error(f"Error generating {content_file_path}: {message}")
+    return errors
+
+  def handle_page(self, path: str, removed: bool) -> str:
+    if removed:
+      self.graph.remove_page(path)
+      dest_file_path = page_dest_path(self.content_dir_path, self.dest_dir_path, path)
+      if os.path.exists(dest_file_path):
+        os.remove(dest_file_path)
+      return "removed page"
+    return "rebuilt page" if not self.build_pages([path]) else "failed page"
+
+  def handle_asset(self, path: str, removed: bool) -> str:
+    relative_path = os.path.relpath(path, self.static_dir_path)
+    dest_path = os.path.join(self.dest_dir_path, relative_path)
+    if removed:
+      if os.path.exists(dest_path):
+        os.remove(dest_path)
+      action = "removed asset"
+    else:
+      os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+      copy_file(path, dest_path)
+      action = "copied asset"
+    if os.path.splitext(path)[1].lower() not in IMAGE_EXTENSIONS:
+      return action
+
+    # Sizes and derivatives are refreshed, then the pages showing the image re-rendered
+    self.images = self.process_images()
+    pages = [page for page in self.graph.dependents(path) if os.path.exists(page)]
+    errors = self.build_pages(pages)
+    return f"{action}, rebuilt {len(pages) - len(errors)} of {len(pages)} pages"
+
+  def run(self, interval: float = 0.1):
+    while True:
+      time.sleep(interval)
+      self.poll()
+
+
+def serve(dest_dir_path: str, port: int = 8888) -> ThreadingHTTPServer:
+  handler = partial(SimpleHTTPRequestHandler, directory=dest_dir_path)
+  server = ThreadingHTTPServer(("", port), handler)
+  threading.Thread(target=server.serve_forever, daemon=True).start()
+  logger.info(f"Serving {dest_dir_path} on http://localhost:{server.server_address[1]}")
+  return server
+
+
+def main():
+  # Kept for `python3 src/watch.py`; the same as `cli.py serve`
+  from cli import main as cli_main
+
+  cli_main(["serve"])
+
+
+if __name__ == "__main__":
+  main()